@@ -0,0 +1,162 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# state of each worker process, set up once by init_worker
+worker = {}
+
+def init_worker(camera_size):
+    '''
+    Creates the FaceMesh instance of this worker process
+    '''
+    import mediapipe as mp
+    from utils import Transform
+
+    Transform.configure(camera_size=camera_size)
+    worker['face_mesh'] = mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5)
+    worker['models'] = {}
+
+def peak_memory_mb():
+    '''
+    Returns the peak resident memory of this process in MB, or None if unknown
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_job(job):
+    '''
+    Runs one recorded session in a worker, returns its summary and per frame records
+    '''
+    import cv2
+    from model import Model
+    from tracking import Pipeline, Scheduler, Session
+
+    model_path = job.get('model') or './model/predictor.pkl'
+    if model_path not in worker['models']:
+        # offline runs never write back a recalibration
+        worker['models'][model_path] = Model.Model(model_path, state_path=None)
+    model = worker['models'][model_path]
+
+    start = perf_counter()
+    cap = cv2.VideoCapture(job['video'])
+    keyboard = Session.make_keyboard(job['layout'], job['results_dir'])
+    scheduler = Scheduler.InferenceScheduler() if job.get('scheduler') else None
+    session = Session.Session(Pipeline.Pipeline(worker['face_mesh'], model, scheduler=scheduler), keyboard,
+                              cap.get(cv2.CAP_PROP_FPS) or 30.0)
+
+    error = ''
+    try:
+        session.run(cap, job.get('max_frames'))
+    except Exception as e:
+        error = repr(e)
+    finally:
+        cap.release()
+        keyboard.protocol.close()
+    elapsed = perf_counter() - start
+
+    records = session.results()
+    frames = len(records)
+    summary = {
+        'session': job['session'],
+        'video': job['video'],
+        'layout': job['layout'],
+        'model': model_path,
+        'frames': frames,
+        'detection_rate': float(records['detected'].mean()) if frames else 0.0,
+        'selections': len(session.selections),
+        'typed': ''.join(text for _, _, text in session.selections),
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'worker_pid': os.getpid(),
+        'worker_peak_mb': peak_memory_mb(),
+        'error': error,
+    }
+    return summary, records
+
+def load_manifest(path, max_frames=None, scheduler=False, results_dir=None):
+    '''
+    Reads the session list, a csv with video, layout and optionally model and session columns
+    '''
+    jobs = []
+    with open(path, newline='') as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            jobs.append({
+                'session': row.get('session') or os.path.splitext(os.path.basename(row['video']))[0] or str(i),
+                'video': row['video'],
+                'layout': row.get('layout') or 'ltnk',
+                'model': row.get('model') or None,
+                'max_frames': max_frames,
+                'scheduler': scheduler,
+                'results_dir': results_dir,
+            })
+    return jobs
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs recorded sessions through the tracking pipeline in parallel')
+    parser.add_argument('manifest', help='csv with video, layout, model and session columns')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='batch_frames.csv', help='aggregated per frame output')
+    parser.add_argument('--summary', default='batch_summary.csv', help='per session summary')
+    parser.add_argument('--max-frames', type=int, default=None)
+    parser.add_argument('--camera-size', type=int, nargs=2, default=(1280, 720))
+    parser.add_argument('--scheduler', action='store_true', help='skip FaceMesh runs during fixations like the live app')
+    parser.add_argument('--results-dir', help='keep the study results of the sessions here, they are discarded otherwise')
+    args = parser.parse_args()
+
+    # Enter in a recording starts the study protocol, keep its csv out of the working tree
+    results = tempfile.TemporaryDirectory() if args.results_dir is None else None
+    jobs = load_manifest(args.manifest, args.max_frames, args.scheduler, args.results_dir or results.name)
+    start = perf_counter()
+    total_frames = 0
+
+    with open(args.output, 'w', newline='') as frames_file, open(args.summary, 'w', newline='') as summary_file:
+        frames_writer = csv.writer(frames_file)
+        frames_writer.writerow(['session', 'frame', 'time', 'inferred', 'detected', 'gaze_x', 'gaze_y', 'pred_x', 'pred_y'])
+        summary_writer = None
+
+        with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(tuple(args.camera_size),)) as pool:
+            futures = [pool.submit(run_job, job) for job in jobs]
+
+            # results are written as soon as each session finishes, so the
+            # parent only ever holds one session in memory
+            for future in as_completed(futures):
+                summary, records = future.result()
+                for record in records.tolist():
+                    frames_writer.writerow((summary['session'],) + record)
+
+                if summary_writer is None:
+                    summary_writer = csv.DictWriter(summary_file, fieldnames=list(summary.keys()))
+                    summary_writer.writeheader()
+                summary_writer.writerow(summary)
+                summary_file.flush()
+
+                total_frames += summary['frames']
+                print('%s: %d frames at %.1f fps, peak %.0f MB in worker %d %s' % (
+                    summary['session'], summary['frames'], summary['fps'],
+                    summary['worker_peak_mb'] or 0, summary['worker_pid'], summary['error']))
+
+    if results is not None:
+        results.cleanup()
+
+    elapsed = perf_counter() - start
+    print('%d sessions, %d frames in %.1f s (%.1f fps over %d workers)' % (
+        len(jobs), total_frames, elapsed, total_frames / elapsed if elapsed > 0 else 0.0, args.workers))
+
+if __name__ == '__main__':
+    main()
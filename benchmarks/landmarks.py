@@ -0,0 +1,101 @@
+import argparse
+import numpy as np
+from time import perf_counter
+
+from tracking import Landmarks
+
+# run from the repository root with: python -m benchmarks.landmarks
+
+def landmark_list_class():
+    '''
+    Returns the NormalizedLandmarkList message class, from mediapipe when it is
+    installed and otherwise built from the same schema with protobuf, which
+    mediapipe depends on
+    '''
+    try:
+        from mediapipe.framework.formats import landmark_pb2
+        return landmark_pb2.NormalizedLandmarkList
+    except ImportError:
+        pass
+
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+    proto = descriptor_pb2.FileDescriptorProto(name='benchmark_landmark.proto', package='benchmark', syntax='proto2')
+    landmark = proto.message_type.add(name='NormalizedLandmark')
+    for number, name in enumerate(('x', 'y', 'z', 'visibility', 'presence'), 1):
+        landmark.field.add(name=name, number=number, type=descriptor_pb2.FieldDescriptorProto.TYPE_FLOAT,
+                           label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL)
+    landmarks = proto.message_type.add(name='NormalizedLandmarkList')
+    landmarks.field.add(name='landmark', number=1, type=descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE,
+                        type_name='.benchmark.NormalizedLandmark', label=descriptor_pb2.FieldDescriptorProto.LABEL_REPEATED)
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(proto)
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName('benchmark.NormalizedLandmarkList'))
+
+def face(cls, rng, count=478):
+    '''
+    A FaceMesh sized landmark list with random coordinates, like refine_landmarks=True returns
+    '''
+    message = cls()
+    for x, y, z in rng.uniform(0.05, 0.95, (count, 3)).astype(np.float32).tolist():
+        point = message.landmark.add()
+        point.x, point.y, point.z = x, y, z
+    return message
+
+# the alternative to reading the needed landmarks: serialize the whole list
+# and view it as records. With only x, y and z set every landmark has the
+# same 17 byte layout on the wire
+RECORD_DTYPE = np.dtype([
+    ('tag', 'u1'), ('length', 'u1'),
+    ('x_tag', 'u1'), ('x', '<f4'),
+    ('y_tag', 'u1'), ('y', '<f4'),
+    ('z_tag', 'u1'), ('z', '<f4'),
+])
+RECORD_TAGS = (0x0a, 15, 0x0d, 0x15, 0x1d)
+
+class SerializedExtractor(Landmarks.LandmarkExtractor):
+    '''
+    Reads the landmarks from SerializeToString through RECORD_DTYPE
+    '''
+    def extract(self, face_landmarks):
+        records = np.frombuffer(face_landmarks.SerializeToString(), dtype=RECORD_DTYPE)
+        fixed = ((records['tag'] == RECORD_TAGS[0]) & (records['length'] == RECORD_TAGS[1]) & (records['x_tag'] == RECORD_TAGS[2])
+                 & (records['y_tag'] == RECORD_TAGS[3]) & (records['z_tag'] == RECORD_TAGS[4])).all()
+        if not fixed or len(records) <= self.indices.max():
+            return super().extract(face_landmarks)
+        subset = records[self.indices]
+        self.points[:, 0] = subset['x']
+        self.points[:, 1] = subset['y']
+        self.points[:, 2] = subset['z']
+        self.valid = True
+        return True
+
+def measure(extractor, faces, repeat):
+    start = perf_counter()
+    for _ in range(repeat):
+        for message in faces:
+            extractor.extract(message)
+    return (perf_counter() - start) / (repeat * len(faces)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares ways of reading the FaceMesh landmarks the pipeline needs')
+    parser.add_argument('--faces', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    cls = landmark_list_class()
+    rng = np.random.default_rng(0)
+    faces = [face(cls, rng) for _ in range(args.faces)]
+
+    extractors = {'direct': Landmarks.LandmarkExtractor(), 'serialized': SerializedExtractor()}
+    for name, extractor in extractors.items():
+        extractor.extract(faces[0])
+        print('%-10s %6.2f us per face' % (name, measure(extractor, faces, args.repeat)))
+
+    # both have to read the same values
+    for message in faces[:5]:
+        for extractor in extractors.values():
+            extractor.extract(message)
+        assert np.array_equal(extractors['direct'].points, extractors['serialized'].points)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import cv2
+import numpy as np
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from utils import Transform
+from model import Model
+from tracking import Landmarks, Pipeline, Scheduler, Session
+
+# run from the repository root with: python -m benchmarks.latency
+
+# synthetic fixtures for LTNK, every target is on the page that the previous selection leads to
+FIXTURES = {
+    # walks through the pages
+    'pages': ['klmnopqrst', 'm', 'Shift', 'Q', '...', 'ABCDEFGHIJ', 'E', 'Delete', '...', 'Enter'],
+    # saccades between neighbouring keys, the iris only moves 2 to 3 px
+    'neighbours': ['klmnopqrst', 'l', 'm', 'n', 's', 'r', 'q', 'l', 'k', 'p'],
+}
+
+class ScriptedFaceMesh:
+    '''
+    Stand-in for FaceMesh in synthetic runs, returns the iris and eye corner
+    landmarks the synthetic camera is currently showing
+    '''
+    class Point:
+        __slots__ = ('x', 'y', 'z')
+
+        def __init__(self, x, y, z):
+            self.x, self.y, self.z = x, y, z
+
+    class Landmarks:
+        def __init__(self, landmark):
+            self.landmark = landmark
+
+    class Results:
+        def __init__(self, face):
+            self.multi_face_landmarks = [face] if face is not None else None
+
+    def __init__(self, camera, count=478):
+        self.camera = camera
+        self.face = self.Landmarks([self.Point(0.5, 0.5, 0.5) for _ in range(count)])
+
+    def process(self, image):
+        if self.camera.iris is None:
+            return self.Results(None)
+        corners = {Landmarks.LEFT_IRIS: (Landmarks.DEFAULT_LANDMARKS['left_outer_corner'], Landmarks.DEFAULT_LANDMARKS['left_inner_corner']),
+                   Landmarks.RIGHT_IRIS: (Landmarks.DEFAULT_LANDMARKS['right_outer_corner'], Landmarks.DEFAULT_LANDMARKS['right_inner_corner'])}
+        for (iris, center), index in zip(self.camera.eyes(), (Landmarks.LEFT_IRIS, Landmarks.RIGHT_IRIS)):
+            self.face.landmark[index].x, self.face.landmark[index].y = iris
+            half_w = self.camera.eye_size[0] / 2 / self.camera.size[0]
+            for corner, side in zip(corners[index], (1, -1)):
+                self.face.landmark[corner].x, self.face.landmark[corner].y = center[0] + side * half_w, center[1]
+        return self.Results(self.face)
+
+class SyntheticCamera:
+    '''
+    Fake camera that shifts the gaze to a new target at scripted frames. The
+    target is resolved to an iris position when the shift happens, so it can
+    depend on the keyboard page at that time. Two eyes are drawn with the
+    irises moved by the same amount from where they are when looking at rest,
+    with sub pixel precision and camera noise, so the scheduler's frame
+    difference has to find real iris sized movements
+    '''
+    SKIN = (180, 140, 120)
+    SCLERA = (225, 215, 210)
+    IRIS = (90, 65, 50)
+    PUPIL = (20, 20, 20)
+
+    def __init__(self, shifts, resolve, size=(1280, 720), frames=None, rest=(0.5, 0.5), eye_distance=0.125,
+                 eye_size=(80, 34), iris_radius=16, noise=6.0, seed=0):
+        self.shifts = dict(shifts)
+        self.resolve = resolve
+        self.size = size
+        self.frames = frames if frames is not None else max(self.shifts) + 1
+        self.frame = 0
+        self.iris = None
+        # normalized iris position when looking at rest, the eyes are centred on it
+        self.rest = rest
+        self.eye_distance = eye_distance
+        self.eye_size = eye_size
+        self.iris_radius = iris_radius
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.blank = np.full((size[1], size[0], 3), self.SKIN, dtype=np.uint8)
+
+    def eyes(self):
+        '''
+        Returns the normalized (iris, eye centre) of both eyes in the mirrored
+        frame the pipeline sees. The mean of the irises is the scripted iris position
+        '''
+        eyes = []
+        for side in (1, -1):
+            center = (self.rest[0] + side * self.eye_distance / 2, self.rest[1])
+            eyes.append(((center[0] + self.iris[0] - self.rest[0], center[1] + self.iris[1] - self.rest[1]), center))
+        return eyes
+
+    def draw_eye(self, image, iris, center):
+        width, height = self.size
+        # the pipeline mirrors the frame, so draw at the mirrored position
+        cx, cy = int((1 - center[0]) * width), int(center[1] * height)
+        half_w, half_h = self.eye_size[0] // 2 + 4, self.eye_size[1] // 2 + 4
+        patch = np.full((2 * half_h, 2 * half_w, 3), self.SKIN, dtype=np.uint8)
+        eye = np.full_like(patch, self.SCLERA)
+        # 4 fractional bits place the iris with sub pixel precision
+        ix = int(round(((1 - iris[0]) * width - cx + half_w) * 16))
+        iy = int(round((iris[1] * height - cy + half_h) * 16))
+        cv2.circle(eye, (ix, iy), self.iris_radius * 16, self.IRIS, cv2.FILLED, cv2.LINE_AA, 4)
+        cv2.circle(eye, (ix, iy), self.iris_radius * 16 * 3 // 8, self.PUPIL, cv2.FILLED, cv2.LINE_AA, 4)
+        mask = np.zeros(patch.shape[:2], dtype=np.uint8)
+        cv2.ellipse(mask, (half_w, half_h), (self.eye_size[0] // 2, self.eye_size[1] // 2), 0, 0, 360, 255, cv2.FILLED)
+        patch[mask > 0] = eye[mask > 0]
+        patch = np.clip(patch + self.rng.normal(0, self.noise, patch.shape), 0, 255).astype(np.uint8)
+        image[cy - half_h:cy + half_h, cx - half_w:cx + half_w] = patch
+
+    def isOpened(self):
+        return self.frame < self.frames
+
+    def read(self):
+        if self.frame >= self.frames:
+            return False, None
+        if self.frame in self.shifts:
+            self.iris = self.resolve(self.shifts[self.frame])
+        self.frame += 1
+
+        image = self.blank.copy()
+        if self.iris is not None:
+            for iris, center in self.eyes():
+                self.draw_eye(image, iris, center)
+        return True, image
+
+    def release(self):
+        pass
+
+def load_events(path):
+    '''
+    Reads the gaze shifts of a fixture video, a csv with frame and target columns
+    '''
+    with open(path, newline='') as f:
+        return [(int(row['frame']), row['target']) for row in csv.DictReader(f)]
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else float('nan')
+
+def run(cap, face_mesh, model, keyboard, shifts, fps, use_scheduler=True, stable_interval=None):
+    '''
+    Runs the pipeline over the source and measures, for every gaze shift, how
+    long it takes until the target is hovered and until it is selected
+    '''
+    scheduler = Scheduler.InferenceScheduler() if use_scheduler else None
+    if scheduler is not None and stable_interval is not None:
+        scheduler.stable_interval = stable_interval
+    pipeline = Pipeline.Pipeline(face_mesh, model, scheduler=scheduler)
+    session = Session.Session(pipeline, keyboard, fps)
+    period = 1.0 / fps
+
+    stages = {'capture': [], 'inference': [], 'prediction': [], 'hover': []}
+    shift_frames = dict(shifts)
+    trials = []
+    current = None
+
+    while cap.isOpened():
+        frame = session.frame
+        start = perf_counter()
+        success, image = cap.read()
+        if not success:
+            break
+        captured = perf_counter()
+
+        if frame in shift_frames:
+            current = {'target': shift_frames[frame], 'frame': frame, 'hover': None, 'selected': None}
+            trials.append(current)
+            selections = len(session.selections)
+
+        cursor = session.step(image)
+        done = perf_counter()
+
+        stages['capture'].append(captured - start)
+        stages['inference'].append(pipeline.timings['facemesh'])
+        stages['prediction'].append(pipeline.timings['predict'])
+        stages['hover'].append(done - captured - pipeline.timings['facemesh'] - pipeline.timings['predict'])
+
+        if current is None:
+            continue
+        # latency is the simulated time between the shift and the frame it was
+        # noticed on, plus the processing time of that frame
+        processing = done - start
+        if current['hover'] is None and cursor is not None:
+            i = keyboard.page.hit_test(*cursor)
+            if i >= 0 and keyboard.button_list[i].text == current['target']:
+                current['hover'] = (frame - current['frame']) * period + processing
+        if current['selected'] is None and len(session.selections) > selections:
+            if session.selections[-1][2] == current['target']:
+                current['selected'] = (frame - current['frame']) * period + processing
+
+    return stages, trials
+
+def report(stages, trials):
+    result = {'stages_ms': {}, 'trials': trials}
+    for name, values in stages.items():
+        values = np.array(values) * 1000
+        result['stages_ms'][name] = {'mean': float(values.mean()) if len(values) else float('nan'),
+                                     'p95': percentile(values, 95)}
+    hover = [t['hover'] * 1000 for t in trials if t['hover'] is not None]
+    selected = [t['selected'] * 1000 for t in trials if t['selected'] is not None]
+    result['hover_ms'] = {'mean': float(np.mean(hover)) if hover else float('nan'), 'p95': percentile(hover, 95)}
+    result['selection_ms'] = {'mean': float(np.mean(selected)) if selected else float('nan'), 'p95': percentile(selected, 95)}
+    result['missed'] = sum(1 for t in trials if t['selected'] is None)
+    return result
+
+def regressions(result, baseline, tolerance):
+    '''
+    Returns the metrics that got slower than the baseline by more than tolerance
+    '''
+    failures = []
+    checks = [('hover_ms', result['hover_ms']['mean'], baseline['hover_ms']['mean']),
+              ('selection_ms', result['selection_ms']['mean'], baseline['selection_ms']['mean'])]
+    checks += [('stages_ms.' + name, value['mean'], baseline['stages_ms'][name]['mean'])
+               for name, value in result['stages_ms'].items() if name in baseline['stages_ms']]
+    for name, value, reference in checks:
+        if value > reference * (1 + tolerance):
+            failures.append('%s %.2f ms vs baseline %.2f ms' % (name, value, reference))
+    if result['missed'] > baseline['missed']:
+        failures.append('%d missed selections vs baseline %d' % (result['missed'], baseline['missed']))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures gaze to selection latency on synthetic or recorded fixtures')
+    parser.add_argument('--video', help='fixture video, uses the real FaceMesh')
+    parser.add_argument('--events', help='csv of frame,target gaze shifts for the fixture video')
+    parser.add_argument('--layout', default='ltnk')
+    parser.add_argument('--fixture', default='pages', choices=FIXTURES, help='synthetic fixture')
+    parser.add_argument('--targets', nargs='*', help='targets of the synthetic fixture, instead of --fixture')
+    parser.add_argument('--hold', type=int, default=45, help='frames the synthetic gaze stays on each target')
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--no-scheduler', action='store_true')
+    parser.add_argument('--stable-interval', type=int, help='frames per inference during a fixation, the governor raises it to 4')
+    parser.add_argument('--output', help='write the report as json')
+    parser.add_argument('--baseline', help='fail if slower than this json report')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--results-dir', help='keep the study results of Enter here, they are discarded otherwise')
+    args = parser.parse_args()
+
+    model = Model.Model(state_path=None)
+    # the Enter target starts the study protocol, keep its csv out of the working tree
+    results = tempfile.TemporaryDirectory() if args.results_dir is None else None
+    keyboard = Session.make_keyboard(args.layout, args.results_dir or results.name)
+
+    if args.video:
+        import mediapipe as mp
+        cap = cv2.VideoCapture(args.video)
+        Transform.configure(camera_size=(cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        shifts = load_events(args.events)
+        face_mesh = mp.solutions.face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True,
+                                                    min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    else:
+        targets = args.targets or FIXTURES[args.fixture]
+        shifts = [(i * args.hold, target) for i, target in enumerate(targets)]
+
+        def iris_position(x, y):
+            # iris position that the model maps onto a screen point
+            model_x, model_y = model.inverse(x, y)
+            model_w, model_h = Transform.current.sizes[Transform.MODEL]
+            return model_x / model_w, model_y / model_h
+
+        def resolve(target):
+            button = keyboard.page.find(target)
+            return iris_position(*button.mid_point()) if button is not None else None
+
+        screen_w, screen_h = Transform.current.sizes[Transform.SCREEN]
+        cap = SyntheticCamera(shifts, resolve, frames=len(shifts) * args.hold, rest=iris_position(screen_w / 2, screen_h / 2))
+        face_mesh = ScriptedFaceMesh(cap)
+
+    # on_mouse prints the dwell time of every selection
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        stages, trials = run(cap, face_mesh, model, keyboard, shifts, args.fps, not args.no_scheduler, args.stable_interval)
+    keyboard.protocol.close()
+    if results is not None:
+        results.cleanup()
+    result = report(stages, trials)
+
+    for name, value in result['stages_ms'].items():
+        print('%-10s mean %7.3f ms  p95 %7.3f ms' % (name, value['mean'], value['p95']))
+    for trial in trials:
+        print('%-12s hover %s  selected %s' % (trial['target'],
+              '%.0f ms' % (trial['hover'] * 1000) if trial['hover'] is not None else '-',
+              '%.0f ms' % (trial['selected'] * 1000) if trial['selected'] is not None else 'missed'))
+    print('hover mean %.0f ms, selection mean %.0f ms, %d missed' % (
+        result['hover_ms']['mean'], result['selection_ms']['mean'], result['missed']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = regressions(result, json.load(f), args.tolerance)
+        for failure in failures:
+            print('REGRESSION:', failure)
+        if failures:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import traceback
+import cv2
+import numpy as np
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from study import Protocol
+from keyboards import LTNKKeyboard, QWERTYKeyboard
+
+# run from the repository root with: python -m benchmarks.state_machines
+
+def ltnk_page(keyboard):
+    return LTNKKeyboard.PAGES[keyboard.keyboard_page]
+
+def qwerty_page(keyboard):
+    return 'default' if keyboard.key_mode == QWERTYKeyboard.Key_Mode.DEFAULT else 'shifted'
+
+class LTNKPages:
+    '''
+    The LTNK page that should be showing, from the selections alone and
+    written down from how the keyboard is meant to work, not from its code.
+    Every navigation key opens its page and Shift switches the case. A key
+    with letters on it carries the case in its label, the others keep the
+    current one
+    '''
+    TARGETS = {
+        'abcdefghij': 'a_to_j',
+        'klmnopqrst': 'k_to_t',
+        'uvwxyz': 'u_to_z',
+        '0-9': 'nums',
+        '!@#$%^&*()': 'symbols_1',
+        "-=[]\\;',./": 'symbols_2',
+        '_+{}|:"<>?': 'symbols_3',
+        '...': 'default',
+    }
+    # pages without letters that look the same in both cases
+    CASELESS = {'symbols_1', 'symbols_2'}
+
+    def __init__(self):
+        self.group = 'default'
+        self.caps = False
+
+    def select(self, text):
+        if text == 'Shift':
+            self.caps = not self.caps
+        elif text.lower() in self.TARGETS:
+            self.group = self.TARGETS[text.lower()]
+            if text.lower() != text.upper():
+                self.caps = text.isupper()
+
+    @property
+    def page(self):
+        return self.group + '_caps' if self.caps and self.group not in self.CASELESS else self.group
+
+class QWERTYPages:
+    '''
+    The QWERTY page that should be showing: Shift shifts the next key only
+    '''
+    def __init__(self):
+        self.page = 'default'
+
+    def select(self, text):
+        self.page = 'shifted' if text == 'Shift' else 'default'
+
+# keyboard class, the page its state says should be showing and an
+# independent model of the page that should be showing
+KEYBOARDS = {
+    'ltnk': (LTNKKeyboard.LTNKKeyboard, ltnk_page, LTNKPages),
+    'qwerty': (QWERTYKeyboard.QWERTYKeyboard, qwerty_page, QWERTYPages),
+}
+
+class EventSource:
+    '''
+    Generates mouse positions in gestures. A gesture either dwells on a random
+    button of the current page, with jitter inside the button and a random
+    length that may or may not complete the dwell, or wanders over the window
+    '''
+    def __init__(self, keyboard, seed=0, window_size=(1280, 720), dwell_share=0.7, max_hold=40, chunk=65536):
+        self.keyboard = keyboard
+        self.rng = np.random.default_rng(seed)
+        self.window_size = window_size
+        self.dwell_share = dwell_share
+        self.max_hold = max_hold
+        self.chunk = chunk
+        self.refill()
+        self.remaining = 0
+        self.box = None
+
+    def refill(self):
+        # random numbers are drawn in chunks, drawing them per event costs more than on_mouse
+        self.uniform = self.rng.random((self.chunk, 2))
+        self.used = 0
+
+    def random(self):
+        if self.used == self.chunk:
+            self.refill()
+        self.used += 1
+        return self.uniform[self.used - 1]
+
+    def start_gesture(self):
+        page = self.keyboard.page
+        self.remaining = int(self.rng.integers(1, self.max_hold))
+        if self.rng.random() < self.dwell_share:
+            x1, y1, x2, y2 = page.boxes[self.rng.integers(len(page))]
+            self.box = (x1, y1, x2 - x1, y2 - y1)
+        else:
+            self.box = (0, 0, self.window_size[0] - 1, self.window_size[1] - 1)
+
+    def next(self):
+        if self.remaining == 0:
+            self.start_gesture()
+        self.remaining -= 1
+        u = self.random()
+        x, y, w, h = self.box
+        return int(x + u[0] * w), int(y + u[1] * h)
+
+def fuzz(name, events, seed=0, max_violations=20):
+    '''
+    Feeds synthetic mouse moves to one keyboard and checks its invariants
+    after every event. Returns the throughput and what went wrong
+    '''
+    cls, state_page, pages = KEYBOARDS[name]
+    keyboard = cls()
+    # Enter starts the study protocol, keep its csv out of the working tree
+    results = tempfile.TemporaryDirectory()
+    protocol = Protocol.Protocol.load(name)
+    protocol.output = os.path.join(results.name, '{time}.csv')
+    keyboard.protocol = Protocol.ProtocolRunner(protocol)
+
+    source = EventSource(keyboard, seed)
+    # events arrive at 30 per second of simulated time, whatever the machine's speed
+    clock = [0.0]
+    keyboard.clock = lambda: clock[0]
+    selections = []
+    expected = pages()
+
+    def on_select(button):
+        selections.append(button.text)
+        expected.select(button.text)
+    keyboard.on_select = on_select
+    visited = {keyboard.page.name}
+    violations = []
+    on_mouse_time = 0.0
+    adjust_time = 0.0
+
+    # on_mouse prints the dwell time of every selection
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for i in range(events):
+            x, y = source.next()
+            clock[0] += 1 / 30
+            state = (keyboard.page.name, len(selections))
+            try:
+                start = perf_counter()
+                keyboard.on_mouse(cv2.EVENT_MOUSEMOVE, x, y, 0, None)
+                middle = perf_counter()
+                keyboard.adjust_cursor(x, y)
+                adjust_time += perf_counter() - middle
+                on_mouse_time += middle - start
+            except Exception:
+                violations.append({'event': i, 'position': (x, y), 'page': state[0], 'error': traceback.format_exc()})
+            else:
+                page = state_page(keyboard)
+                if keyboard.page.name != page or keyboard.button_list is not keyboard.page.buttons:
+                    violations.append({'event': i, 'position': (x, y), 'page': state[0],
+                                       'error': 'showing %s, state says %s' % (keyboard.page.name, page)})
+                elif keyboard.page.name != expected.page:
+                    violations.append({'event': i, 'position': (x, y), 'page': state[0],
+                                       'error': 'showing %s after %r, expected %s' % (keyboard.page.name, selections[-1], expected.page)})
+            visited.add(keyboard.page.name)
+            if len(violations) >= max_violations:
+                break
+    results.cleanup()
+
+    return {
+        'keyboard': name,
+        'events': i + 1,
+        'selections': len(selections),
+        'on_mouse_per_s': (i + 1) / on_mouse_time if on_mouse_time else float('nan'),
+        'adjust_cursor_per_s': (i + 1) / adjust_time if adjust_time else float('nan'),
+        'unreached': sorted(set(keyboard.layout.pages) - visited),
+        'violations': violations,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzzes the keyboard state machines with synthetic mouse moves')
+    parser.add_argument('--keyboards', nargs='*', default=sorted(KEYBOARDS), choices=sorted(KEYBOARDS))
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the report as json')
+    args = parser.parse_args()
+
+    reports = []
+    failed = False
+    for name in args.keyboards:
+        report = fuzz(name, args.events, args.seed)
+        reports.append(report)
+        print('%-7s %d events, %d selections, on_mouse %.0f events/s, adjust_cursor %.0f events/s' % (
+            name, report['events'], report['selections'], report['on_mouse_per_s'], report['adjust_cursor_per_s']))
+        if report['unreached']:
+            print('  unreached pages:', ', '.join(report['unreached']))
+        for violation in report['violations']:
+            print('  event %d at %s on %s: %s' % (violation['event'], violation['position'], violation['page'], violation['error'].strip()))
+        failed = failed or bool(report['unreached'] or report['violations'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
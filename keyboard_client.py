@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+
+from utils import Transform
+
+# runs the keyboard UI as a separate process, reading gaze from the service
+# that main.py starts when GAZE_SERVICE=1 is set
+WINDOW_SIZE = (1280, 720)
+SCREEN_SIZE = (1440, 900)
+transform = Transform.configure(window_size=WINDOW_SIZE, screen_size=SCREEN_SIZE)
+
+from pynput.mouse import Controller
+mouse = Controller()
+
+# from keyboards import QWERTYKeyboard
+# keyboard = QWERTYKeyboard.QWERTYKeyboard()
+
+from keyboards import LTNKKeyboard
+keyboard = LTNKKeyboard.LTNKKeyboard()
+
+from tracking import Service
+
+# only the newest sample matters, older ones are overwritten before the UI sees them
+latest = [None]
+def on_message(message):
+  latest[0] = message
+
+client = Service.GazeClient(max_age=0.1)
+client.run(on_message)
+
+cv2.namedWindow("Keyboard", cv2.WND_PROP_FULLSCREEN)
+cv2.setWindowProperty("Keyboard", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+cv2.setMouseCallback("Keyboard", keyboard.on_mouse)
+
+background = np.full((WINDOW_SIZE[1], WINDOW_SIZE[0], 3), 255, dtype=np.uint8)
+
+while client.thread.is_alive():
+  image = keyboard.draw(background.copy())
+
+  message, latest[0] = latest[0], None
+  if message is not None and message.detected:
+    pred_x, pred_y = message.prediction
+    mouse.position = keyboard.adjust_cursor(*transform.point(Transform.SCREEN, Transform.WINDOW, pred_x, pred_y))
+
+  cv2.imshow("Keyboard", image)
+
+  if cv2.waitKey(5) & 0xFF == 27:
+    break
+
+cv2.destroyAllWindows()
@@ -0,0 +1,105 @@
+import json
+import os
+import numpy as np
+from time import time
+from keyboards.KeyboardCore import REFERENCE_RATE
+
+CLASSES = ('char', 'edit', 'nav')
+
+def key_class(text):
+    '''
+    Characters, editing keys and keys that only switch pages or case
+    '''
+    if len(text) == 1:
+        return 'char'
+    if text in ('Delete', 'Space', 'Enter'):
+        return 'edit'
+    return 'nav'
+
+class DwellController:
+    '''
+    Tunes how fast the dwell progress fills, per key class. A selection
+    that is not undone within correction_window speeds its class up a little,
+    one that is followed by a Delete slows it down a lot, and dwells that were
+    almost complete before the gaze left speed it up slightly. The dwell
+    time stays between min_dwell and max_dwell seconds, whatever the
+    keyboard's step. A keyboard whose default is already outside of them
+    is never tuned further out
+    '''
+    def __init__(self, default, speed_up=1.02, slow_down=0.85, near_miss=1.01, near_miss_progress=60,
+                 correction_window=3.0, min_dwell=0.4, max_dwell=2.0):
+        self.default = default
+        self.speed_up = speed_up
+        self.slow_down = slow_down
+        self.near_miss = near_miss
+        self.near_miss_progress = near_miss_progress
+        self.correction_window = correction_window
+        # the step per event at REFERENCE_RATE that fills the progress in that many seconds
+        self.max_step = max(default, 100 / (min_dwell * REFERENCE_RATE))
+        self.min_step = min(default, 100 / (max_dwell * REFERENCE_RATE))
+        self.increments = {name: float(default) for name in CLASSES}
+        # class of every key, per page
+        self.classes = {}
+        self.pending = None
+        self.counts = {'selections': 0, 'corrections': 0, 'near_misses': 0}
+
+    def steps(self, page):
+        '''
+        Returns the step of every key of a page as an array
+        '''
+        classes = self.classes.get(page)
+        if classes is None:
+            classes = self.classes[page] = np.array([CLASSES.index(key_class(text)) for text in page.texts])
+        return np.array([self.increments[name] for name in CLASSES])[classes]
+
+    def scale(self, name, factor):
+        self.increments[name] = self.clamp(self.increments[name] * factor)
+
+    def clamp(self, step):
+        return min(max(step, self.min_step), self.max_step)
+
+    def completed(self, button, now=None):
+        now = time() if now is None else now
+        self.counts['selections'] += 1
+        if self.pending is not None:
+            name, text, at = self.pending
+            # a Delete after a Delete is deleting more, not undoing the first one
+            if button.text == 'Delete' and text != 'Delete' and now - at <= self.correction_window:
+                # the previous selection was a mistake
+                self.counts['corrections'] += 1
+                self.scale(name, self.slow_down)
+                self.pending = None
+                return
+            self.scale(name, self.speed_up)
+        self.pending = (key_class(button.text), button.text, now)
+
+    def aborted(self, button, percentage):
+        # only count dwells the user clearly meant, not the gaze passing over a key
+        if percentage >= self.near_miss_progress:
+            self.counts['near_misses'] += 1
+            self.scale(key_class(button.text), self.near_miss)
+
+    def to_dict(self):
+        return {'default': self.default, 'increments': self.increments, 'counts': self.counts}
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        '''
+        Takes over the tuned values of a previous session, returns false if there are none
+        '''
+        if not os.path.exists(path):
+            return False
+        with open(path) as f:
+            state = json.load(f)
+        # values tuned for another keyboard's step do not carry over
+        if state.get('default') != self.default:
+            return False
+        # files from before the bounds were in seconds can hold faster steps
+        self.increments.update({name: self.clamp(step) for name, step in state['increments'].items()})
+        self.counts.update(state['counts'])
+        return True
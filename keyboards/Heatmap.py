@@ -0,0 +1,146 @@
+import argparse
+import os
+import threading
+import cv2
+import numpy as np
+from time import time
+from keyboards.KeyboardCore import Layout
+from utils import Transform
+
+KINDS = ('gaze', 'hover', 'dwell')
+
+class GazeHeatmap:
+    '''
+    Counts where the gaze lands on every page of a layout in fixed size grids.
+    Points are buffered and folded into the grids with one bincount per
+    flush, so adding a point is a few array writes and memory never grows.
+    The periodic snapshots are merged and written on a background thread
+    '''
+    def __init__(self, layout, path=None, cell=8, buffer_size=4096, interval=60.0, window_size=None):
+        self.layout = layout
+        self.path = path
+        self.cell = cell
+        self.interval = interval
+        width, height = window_size if window_size is not None else Transform.current.sizes[Transform.WINDOW]
+        self.shape = (height // cell + 1, width // cell + 1)
+        self.pages = list(layout.pages)
+        self.page_ids = {name: i for i, name in enumerate(self.pages)}
+        self.grids = np.zeros((len(self.pages), len(KINDS)) + self.shape, dtype=np.int64)
+
+        self.buffer = np.zeros(buffer_size, dtype=np.int64)
+        self.count = 0
+        self.last_snapshot = time()
+        self.writer = None
+
+    def add(self, page, kind, x, y):
+        row = min(max(int(y) // self.cell, 0), self.shape[0] - 1)
+        col = min(max(int(x) // self.cell, 0), self.shape[1] - 1)
+        grid = self.page_ids[page] * len(KINDS) + KINDS.index(kind)
+        self.buffer[self.count] = (grid * self.shape[0] + row) * self.shape[1] + col
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+        counts = np.bincount(self.buffer[:self.count], minlength=self.grids.size)
+        self.grids += counts.reshape(self.grids.shape)
+        self.count = 0
+
+    def maybe_snapshot(self, now=None):
+        '''
+        Writes a snapshot once every interval seconds, call it every frame.
+        The frame loop only hands over the grids, the file is read, merged and
+        written by a background thread. While one is still writing the counts
+        keep adding up for the next snapshot
+        '''
+        now = time() if now is None else now
+        if self.path is None or now - self.last_snapshot < self.interval:
+            return
+        if self.writer is not None and self.writer.is_alive():
+            return
+        self.flush()
+        grids, self.grids = self.grids, np.zeros_like(self.grids)
+        self.writer = threading.Thread(target=self.write, args=(self.path, grids), daemon=True)
+        self.writer.start()
+        self.last_snapshot = now
+
+    def snapshot(self, path=None):
+        '''
+        Writes a snapshot right away, after a background snapshot still being written
+        '''
+        path = path if path is not None else self.path
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        self.flush()
+        self.write(path, self.grids)
+        self.grids[:] = 0
+
+    def write(self, path, grids):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # adds to what an earlier run of the same layout collected
+        if os.path.exists(path):
+            previous = np.load(path)
+            if list(previous['pages']) == self.pages and previous['grids'].shape == grids.shape:
+                grids = grids + previous['grids']
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, grids=grids, pages=np.array(self.pages), kinds=np.array(KINDS), cell=self.cell)
+        os.replace(tmp_path, path)
+
+def render(path, layout, output_dir, kind='gaze'):
+    '''
+    Draws one heatmap per page over the keys
+    '''
+    data = np.load(path)
+    cell = int(data['cell'])
+    kinds = list(data['kinds'])
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for i, name in enumerate(data['pages']):
+        page = layout.pages.get(str(name))
+        grid = data['grids'][i, kinds.index(kind)].astype(np.float64)
+        if page is None or grid.sum() == 0:
+            continue
+
+        height, width = grid.shape[0] * cell, grid.shape[1] * cell
+        img = np.full((height, width, 3), 255, dtype=np.uint8)
+        page.reset()
+        page.draw(img)
+        heat = cv2.resize((255 * grid / grid.max()).astype(np.uint8), (width, height), interpolation=cv2.INTER_LINEAR)
+        colored = cv2.applyColorMap(heat, cv2.COLORMAP_JET)
+        mask = (heat > 0)[:, :, None]
+        img = np.where(mask, cv2.addWeighted(img, 0.4, colored, 0.6, 0), img)
+
+        # every dwell cell belongs to the closest key, the line goes from the
+        # key centre to where its dwells actually landed
+        dwell = data['grids'][i, kinds.index('dwell')].astype(np.float64)
+        ys, xs = (np.indices(dwell.shape) + 0.5) * cell
+        b = page.boxes
+        dx = np.maximum(np.maximum(b[:, 0] - xs[:, :, None], xs[:, :, None] - b[:, 2]), 0)
+        dy = np.maximum(np.maximum(b[:, 1] - ys[:, :, None], ys[:, :, None] - b[:, 3]), 0)
+        nearest = np.argmin(dx ** 2 + dy ** 2, axis=2)
+        for k, (cx, cy) in enumerate(page.centers.tolist()):
+            weights = dwell * (nearest == k)
+            if weights.sum() > 0:
+                gx = int((weights * xs).sum() / weights.sum())
+                gy = int((weights * ys).sum() / weights.sum())
+                cv2.line(img, (cx, cy), (gx, gy), (0, 0, 0), 2)
+                cv2.circle(img, (gx, gy), 4, (0, 0, 0), cv2.FILLED)
+
+        out = os.path.join(output_dir, '%s_%s.png' % (name, kind))
+        cv2.imwrite(out, img)
+        written.append(out)
+    return written
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Renders gaze heatmap snapshots over a keyboard layout')
+    parser.add_argument('snapshot')
+    parser.add_argument('--layout', default='ltnk')
+    parser.add_argument('--kind', default='gaze', choices=KINDS)
+    parser.add_argument('--output', default='./heatmaps')
+    args = parser.parse_args()
+    for path in render(args.snapshot, Layout.load(args.layout), args.output, args.kind):
+        print(path)
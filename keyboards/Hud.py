@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+from time import perf_counter
+from utils.RingBuffer import RingBuffer
+
+STAGES = ('capture', 'facemesh', 'predict', 'draw')
+
+class Hud:
+    '''
+    Performance overlay drawn inside the prompt area. Everything is pushed
+    into ring buffers, the text is only recomputed every refresh frames
+    '''
+    def __init__(self, size=120, jitter_size=15, refresh=10):
+        self.refresh = refresh
+        self.frame_times = RingBuffer(size)
+        self.detected = RingBuffer(size, np.bool_)
+        self.pred_x = RingBuffer(jitter_size)
+        self.pred_y = RingBuffer(jitter_size)
+        self.stages = {stage: RingBuffer(size) for stage in STAGES}
+        self.dwell_resets = 0
+        self.frames = 0
+        self.lines = []
+
+    def stage(self, name, seconds):
+        self.stages[name].push(seconds)
+
+    def frame(self, prediction, dwell_resets=0):
+        '''
+        Call once per frame with the predicted point (or None)
+        '''
+        self.frame_times.push(perf_counter())
+        self.detected.push(prediction is not None)
+        if prediction is not None:
+            self.pred_x.push(prediction[0])
+            self.pred_y.push(prediction[1])
+        self.dwell_resets = dwell_resets
+        self.frames += 1
+
+    def summary(self):
+        frames = len(self.frame_times)
+        elapsed = self.frame_times.newest() - self.frame_times.oldest() if frames > 1 else 0.0
+        # jitter is the spread of the recent predictions, high while fixating means a noisy model input
+        jitter = 0.0
+        if len(self.pred_x) > 1:
+            jitter = float(np.sqrt(self.pred_x.values().var() + self.pred_y.values().var()))
+        return {
+            'fps': (frames - 1) / elapsed if elapsed > 0 else 0.0,
+            'detection_rate': float(self.detected.values().mean()) if frames else 0.0,
+            'jitter': jitter,
+            'dwell_resets': self.dwell_resets,
+            'latency_ms': {stage: buffer.mean() * 1000 for stage, buffer in self.stages.items()},
+        }
+
+    def draw(self, img, origin=(35, 45)):
+        if self.frames % self.refresh == 0 or not self.lines:
+            s = self.summary()
+            latency = s['latency_ms']
+            self.lines = [
+                'FPS %.1f  detect %d%%' % (s['fps'], s['detection_rate'] * 100),
+                'capture %.1f  mesh %.1f ms' % (latency['capture'], latency['facemesh']),
+                'predict %.2f  draw %.1f ms' % (latency['predict'], latency['draw']),
+                'jitter %.1f px  resets %d' % (s['jitter'], s['dwell_resets']),
+            ]
+
+        x, y = origin
+        for line in self.lines:
+            cv2.putText(img, line, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+            y += 20
+        return img
@@ -0,0 +1,491 @@
+import cv2
+import json
+import os
+import numpy as np
+from time import time
+from utils import Transform
+from study import Protocol
+
+LAYOUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts')
+
+# color of hovered keys and of keys a keyboard keeps highlighted
+HOVER_COLOR = (174, 174, 174)
+
+# dwell steps are the progress per mouse event at this event rate, the actual
+# progress is scaled by the time since the previous event so a dwell takes as
+# long at any frame rate. Longer gaps, like the gaze leaving the window, count
+# as MAX_EVENT_GAP so they never complete a dwell at once
+REFERENCE_RATE = 30.0
+MAX_EVENT_GAP = 0.1
+# progress that completes a dwell, steps scaled by time differences add up to
+# a hair under 100 where they would reach it exactly per event
+COMPLETE = 100 - 1e-6
+
+class ProgressView:
+    '''
+    Progress bar of one button, backed by the page arrays
+    '''
+    __slots__ = ('page', 'index')
+
+    def __init__(self, page, index):
+        self.page = page
+        self.index = index
+
+    @property
+    def percentage(self):
+        return self.page.percentage[self.index]
+
+    @percentage.setter
+    def percentage(self, value):
+        self.page.percentage[self.index] = value
+
+    @property
+    def start(self):
+        start = self.page.start[self.index]
+        return None if np.isnan(start) else float(start)
+
+    @start.setter
+    def start(self, value):
+        self.page.start[self.index] = np.nan if value is None else value
+
+    @property
+    def pos(self):
+        return tuple(self.page.progress_pos[self.index].tolist())
+
+    @property
+    def size(self):
+        return tuple(self.page.progress_size[self.index].tolist())
+
+    @property
+    def color(self):
+        return (0, 0, 0)
+
+class ButtonView:
+    '''
+    One button of a page, backed by the page arrays
+    '''
+    __slots__ = ('page', 'index', 'progress')
+
+    text_color = (0, 0, 0)
+
+    def __init__(self, page, index):
+        self.page = page
+        self.index = index
+        self.progress = ProgressView(page, index)
+
+    @property
+    def text(self):
+        return self.page.texts[self.index]
+
+    @property
+    def kind(self):
+        return self.page.kinds[self.index]
+
+    @property
+    def pos(self):
+        return tuple(self.page.pos[self.index].tolist())
+
+    @property
+    def size(self):
+        return tuple(self.page.size[self.index].tolist())
+
+    @property
+    def color(self):
+        return tuple(self.page.color[self.index].tolist())
+
+    @color.setter
+    def color(self, value):
+        self.page.color[self.index] = value
+
+    def is_inside(self, x, y):
+        '''
+        Returns true if the button is within the given coordinates
+        '''
+        x1, y1, x2, y2 = self.page.boxes[self.index]
+        return bool(x1 <= x <= x2 and y1 <= y <= y2)
+
+    def is_clicked(self, x, y):
+        '''
+        Returns true if the button is clicked
+        '''
+        return self.is_inside(x, y)
+
+    def is_hovered_over(self, x, y):
+        '''
+        Returns true if the button is being hovered over
+        '''
+        return self.is_inside(x, y)
+
+    def mid_point(self):
+        """
+        Returns the mid point of the button in screen space
+        """
+        x, y = self.page.centers[self.index]
+        return Transform.current.window_to_screen(int(x), int(y))
+
+    def __repr__(self):
+        return 'ButtonView(%r, %r)' % (self.kind, self.text)
+
+class Page:
+    '''
+    A compiled keyboard page. Every per button property is one row of a
+    numpy array so state updates can be done for all keys at once, the
+    buttons themselves are just views into these arrays
+    '''
+    def __init__(self, name, entries):
+        self.name = name
+        n = len(entries)
+        self.texts = [entry['text'] for entry in entries]
+        self.kinds = [entry['kind'] for entry in entries]
+        self.wrap = np.array([entry.get('wrap', 0) for entry in entries], dtype=np.int32)
+
+        self.pos = np.array([entry['pos'] for entry in entries], dtype=np.int32).reshape(n, 2)
+        self.size = np.array([entry['size'] for entry in entries], dtype=np.int32).reshape(n, 2)
+        self.boxes = np.hstack((self.pos, self.pos + self.size))
+        self.centers = (self.boxes[:, :2] + self.boxes[:, 2:]) // 2
+        self.text_offset = np.array([entry['text_offset'] for entry in entries], dtype=np.int32).reshape(n, 2)
+        self.progress_pos = self.pos + np.array([entry['progress_offset'] for entry in entries], dtype=np.int32).reshape(n, 2)
+        self.progress_size = np.array([entry['progress_size'] for entry in entries], dtype=np.int32).reshape(n, 2)
+
+        self.base_color = np.array([entry['color'] for entry in entries], dtype=np.int32).reshape(n, 3)
+        self.idle_color = self.base_color.copy()
+        self.color = self.base_color.copy()
+        self.percentage = np.zeros(n, dtype=np.float64)
+        self.start = np.full(n, np.nan)
+        # every column and row of the window maps to the set of keys covering
+        # it, the last one is past all keys. The hovered keys of each pair of
+        # sets are built once, so a hover test is two list lookups
+        xs = np.arange(int(self.boxes[:, 2].max()) + 2)[:, None]
+        ys = np.arange(int(self.boxes[:, 3].max()) + 2)[:, None]
+        columns, column_ids = np.unique((self.boxes[:, 0] <= xs) & (xs <= self.boxes[:, 2]), axis=0, return_inverse=True)
+        rows, row_ids = np.unique((self.boxes[:, 1] <= ys) & (ys <= self.boxes[:, 3]), axis=0, return_inverse=True)
+        self.column_ids = column_ids.ravel().tolist()
+        self.row_ids = row_ids.ravel().tolist()
+        self.masks = columns[:, None, :] & rows[None, :, :]
+        # the same as 1 and 0, without the keys that never fill their progress
+        self.active = self.masks.astype(np.float64)
+        self.first = np.where(self.masks.any(axis=2), self.masks.argmax(axis=2), -1).tolist()
+        self.center_list = self.centers.tolist()
+        # the hover cell at the last dwell update, None after a reset, and
+        # whether hovered buttons may have to start their progress
+        self.hovered = None
+        self.restart = True
+
+        self.buttons = [ButtonView(self, i) for i in range(n)]
+        self.index = {text: i for i, text in enumerate(self.texts)}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def reset(self):
+        '''
+        Puts every button back in its initial state
+        '''
+        self.color[:] = self.idle_color
+        self.percentage[:] = 0
+        self.start[:] = np.nan
+        self.hovered = None
+
+    def configure(self, highlighted=(), disabled=()):
+        '''
+        Sets the keys that stay highlighted while not hovered and the keys
+        that never fill their progress
+        '''
+        self.idle_color[:] = self.base_color
+        self.active[:] = self.masks
+        for text in highlighted:
+            if text in self.index:
+                self.idle_color[self.index[text]] = HOVER_COLOR
+        for text in disabled:
+            if text in self.index:
+                self.active[:, :, self.index[text]] = 0
+
+    def hover_cell(self, x, y):
+        '''
+        Returns a (column, row) pair identifying the set of buttons under (x, y)
+        '''
+        x = int(x) if 0 <= x < len(self.column_ids) else -1
+        y = int(y) if 0 <= y < len(self.row_ids) else -1
+        return self.column_ids[x], self.row_ids[y]
+
+    def hover_mask(self, x, y):
+        '''
+        Returns a boolean array of the buttons under (x, y)
+        '''
+        return self.masks[self.hover_cell(x, y)]
+
+    def hit_test(self, x, y):
+        '''
+        Returns the index of the button under (x, y), or -1
+        '''
+        column, row = self.hover_cell(x, y)
+        return self.first[column][row]
+
+    def find(self, text):
+        '''
+        Returns the button with the given text, or None
+        '''
+        i = self.index.get(text)
+        return None if i is None else self.buttons[i]
+
+    def draw(self, img):
+        boxes = self.boxes.tolist()
+        colors = self.color.tolist()
+        offsets = self.text_offset.tolist()
+        wraps = self.wrap.tolist()
+        progress_pos = self.progress_pos.tolist()
+        progress_size = self.progress_size.tolist()
+        widths = (self.percentage / 100 * self.progress_size[:, 0]).astype(np.int32).tolist()
+
+        for i, text in enumerate(self.texts):
+            # draw the button
+            x1, y1, x2, y2 = boxes[i]
+            cv2.rectangle(img, (x1, y1), (x2, y2), colors[i], cv2.FILLED)
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 0), 2)
+
+            tx, ty = x1 + offsets[i][0], y1 + offsets[i][1]
+            wrap = wraps[i]
+            if wrap:
+                cv2.putText(img, text[:wrap], (tx, ty), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, ButtonView.text_color, 1, cv2.LINE_AA)
+                cv2.putText(img, text[wrap:], (tx, ty+30), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, ButtonView.text_color, 1, cv2.LINE_AA)
+            else:
+                cv2.putText(img, text, (tx, ty), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, ButtonView.text_color, 1, cv2.LINE_AA)
+
+            # draw the progress bar
+            px, py = progress_pos[i]
+            pw, ph = progress_size[i]
+            cv2.rectangle(img, (px, py), (px+pw, py+ph), (0, 0, 0))
+            cv2.rectangle(img, (px, py), (px+widths[i], py+ph), (0, 0, 0), cv2.FILLED)
+
+class Layout:
+    '''
+    A keyboard layout compiled from a declarative json file
+    '''
+    def __init__(self, spec):
+        self.name = spec.get('name', '')
+        self.background = spec.get('background')
+        kinds = spec.get('kinds', {})
+        groups = spec.get('groups', {})
+        self.pages = {name: Page(name, self.expand(entries, kinds, groups)) for name, entries in spec['pages'].items()}
+
+    @staticmethod
+    def expand(entries, kinds, groups):
+        '''
+        Flattens the entries of a page into one dict per button. An entry is
+        either {"include": group}, a row {"keys": [...], "origin": [x, y], "step": [dx, dy]}
+        or a single button {"pos": [x, y]}. Any kind setting can be overridden per entry
+        '''
+        buttons = []
+        for entry in entries:
+            if 'include' in entry:
+                buttons.extend(Layout.expand(groups[entry['include']], kinds, groups))
+                continue
+
+            settings = dict(kinds[entry['kind']])
+            settings.update({k: v for k, v in entry.items() if k not in ('keys', 'origin', 'step')})
+            settings.setdefault('progress_size', [40, 5])
+            settings.setdefault('color', [255, 255, 255])
+
+            if 'keys' in entry:
+                x, y = entry['origin']
+                dx, dy = entry.get('step', [settings['size'][0], 0])
+                for i, key in enumerate(entry['keys']):
+                    button = dict(settings)
+                    button['text'] = key
+                    button['pos'] = [x + dx * i, y + dy * i]
+                    buttons.append(button)
+            else:
+                buttons.append(settings)
+        return buttons
+
+    @classmethod
+    def load(cls, name):
+        '''
+        Loads a layout by name from the layouts folder, or from a path
+        '''
+        path = name if os.path.exists(name) else os.path.join(LAYOUT_DIR, name + '.json')
+        with open(path) as f:
+            return cls(json.load(f))
+
+class KeyboardCore:
+    '''
+    Shared state and drawing for the keyboards. Subclasses implement on_mouse
+    '''
+    def __init__(self, layout, protocol):
+        self.layout = Layout.load(layout) if isinstance(layout, str) else layout
+        self.page = None
+        self.button_list = []
+
+        # the study that Enter starts, see study/protocols
+        self.protocol = Protocol.ProtocolRunner(Protocol.Protocol.load(protocol) if isinstance(protocol, str) else protocol)
+
+        # called with the button every time a dwell completes
+        self.on_select = None
+
+        # transcribed text and keystrokes to the OS, see TextOutput
+        self.output = None
+
+        # optional Targeting.TargetResolver, without it the cursor snaps to the key under it
+        self.resolver = None
+
+        # dwells abandoned before completing, and the optional performance overlay
+        self.dwell_resets = 0
+        self.dwell_increment = 4
+        # optional Dwell.DwellController that tunes dwell_increment per key class
+        self.dwell = None
+        self.hud = None
+
+        # where dwell time comes from, offline runs replace it with the frame time
+        self.clock = time
+        self.last_event = None
+
+    def set_page(self, name):
+        '''
+        Switches the buttons to a page of the layout
+        '''
+        self.page = self.layout.pages[name]
+        self.page.configure(self.highlighted(), self.disabled())
+        self.page.reset()
+        self.button_list = self.page.buttons
+
+    def highlighted(self):
+        '''
+        Keys that stay highlighted on the current page, like Shift while it is on
+        '''
+        return ()
+
+    def disabled(self):
+        '''
+        Keys on the current page that can be hovered but never selected
+        '''
+        return ()
+
+    def select(self, button):
+        '''
+        Handles a completed dwell before the keyboard specific behaviour
+        '''
+        if self.on_select is not None:
+            self.on_select(button)
+        if self.dwell is not None:
+            self.dwell.completed(button)
+        if self.resolver is not None:
+            self.resolver.learn(self.context(), button.text)
+        if self.output is not None:
+            self.output.key(button.text)
+
+    def snapshot(self):
+        '''
+        Returns what is needed to put the keyboard back where it was
+        '''
+        return {'layout': self.layout.name, 'page': self.page.name, 'text': self.output.text if self.output is not None else ''}
+
+    def restorable(self, state):
+        '''
+        Returns why a snapshot can not be restored on this keyboard, or None if it can
+        '''
+        if state.get('layout') != self.layout.name:
+            return 'it was taken on the %r layout, not %r' % (state.get('layout'), self.layout.name)
+        if state.get('page') not in self.layout.pages:
+            return 'the %r page does not exist' % state.get('page')
+        return None
+
+    def restore(self, state):
+        self.set_page(state['page'])
+        if self.output is not None:
+            self.output.text = state['text']
+
+    def dwell_steps(self, page):
+        '''
+        Progress added to the keys of the page while they are hovered, one
+        value for all keys or an array
+        '''
+        return self.dwell.steps(page) if self.dwell is not None else self.dwell_increment
+
+    def dwell_update(self, x, y):
+        '''
+        Fills the progress of the buttons under (x, y) and resets all others,
+        in bulk on the page arrays. Returns the buttons whose dwell completed
+        '''
+        now = self.clock()
+        elapsed = 1 / REFERENCE_RATE if self.last_event is None else min(now - self.last_event, MAX_EVENT_GAP)
+        self.last_event = now
+
+        page = self.page
+        cell = page.hover_cell(x, y)
+        hovered = page.masks[cell]
+        if cell != page.hovered:
+            # the buttons that were not hovered before are already reset
+            idle = ~hovered
+            left = idle & (page.percentage > 0)
+            if left.any():
+                for i in np.flatnonzero(left).tolist():
+                    self.dwell_aborted(page.buttons[i])
+            page.percentage[idle] = 0
+            page.color[:] = page.idle_color
+            page.color[hovered] = HOVER_COLOR
+            page.hovered = cell
+            page.restart = True
+        if page.first[cell[0]][cell[1]] < 0:
+            return []
+
+        if page.restart:
+            page.start[hovered & (page.percentage == 0)] = now
+            page.restart = False
+        page.percentage += page.active[cell] * (self.dwell_steps(page) * (elapsed * REFERENCE_RATE))
+        if page.percentage.max() < COMPLETE:
+            return []
+        # the caller resets the completed buttons, they start over on the next update
+        page.restart = True
+        return [page.buttons[i] for i in np.flatnonzero(page.percentage >= COMPLETE).tolist()]
+
+    def dwell_aborted(self, button):
+        '''
+        Called when the gaze leaves a key before its dwell completed
+        '''
+        self.dwell_resets += 1
+        if self.dwell is not None:
+            self.dwell.aborted(button, button.progress.percentage)
+
+    def context(self):
+        '''
+        Returns the text typed so far, the context of the next key
+        '''
+        return self.output.text if self.output is not None else ''
+
+    def draw(self, img):
+        if self.layout.background is not None:
+            x1, y1, x2, y2 = self.layout.background
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 0), cv2.FILLED)
+
+        self.page.draw(img)
+
+        height, width, _ = img.shape
+        cv2.circle(img, (int(width/2), int(height/2)), 1, (0, 255, 255), 5)
+        cv2.circle(img, (int(width/2), int(height/2)), 5, (0, 0, 0), 2)
+        cv2.rectangle(img, (25, 25), (1255, 125), (255, 255, 255), cv2.FILLED)
+        prompt = self.protocol.prompt()
+        if len(prompt) <= 2:
+            cv2.putText(img, prompt, (615, 100), cv2.FONT_HERSHEY_COMPLEX_SMALL, 4, (0, 0, 0), 4)
+        else:
+            # phrases and rest messages are too wide for the large font
+            cv2.putText(img, prompt, (615 - 10 * min(len(prompt), 30), 80), cv2.FONT_HERSHEY_COMPLEX_SMALL, 2, (0, 0, 0), 2)
+        if self.output is not None:
+            # last line of the transcribed text in its own strip between the
+            # prompt and the keys, the HUD takes the left of the prompt box
+            cv2.rectangle(img, (25, 130), (1255, 162), (255, 255, 255), cv2.FILLED)
+            cv2.putText(img, self.output.text.split('\n')[-1][-80:], (35, 154), cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, (0, 0, 0), 1, cv2.LINE_AA)
+
+        if self.hud is not None:
+            self.hud.draw(img)
+
+        return img
+
+    def adjust_cursor(self, x, y):
+        if self.resolver is not None:
+            i = self.resolver.resolve(self.page, x, y, self.context())
+        else:
+            i = self.page.hit_test(x, y)
+        if i >= 0:
+            return Transform.current.window_to_screen(*self.page.center_list[i])
+
+        return Transform.current.window_to_screen(x, y)
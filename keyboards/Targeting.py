@@ -0,0 +1,199 @@
+import math
+import os
+import queue
+import threading
+import numpy as np
+from utils import Transform
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'study', 'protocols', 'phrases.txt')
+
+def cdf(z):
+    '''
+    Logistic approximation of the standard normal cdf, numpy has no erf
+    '''
+    return 1 / (1 + np.exp(-1.702 * z))
+
+def label_char(label):
+    '''
+    Returns the character a button types, or None for page and editing buttons
+    '''
+    if label == 'Space':
+        return ' '
+    return label.lower() if len(label) == 1 else None
+
+class BigramPrior:
+    '''
+    Probability of the next key given the previous character, from smoothed
+    character bigram counts. Buttons that do not type a character get the
+    average character probability so they are neither favoured nor penalised
+    '''
+    def __init__(self, text='', smoothing=1.0):
+        self.smoothing = smoothing
+        self.counts = {}
+        self.learn(text)
+
+    @classmethod
+    def load(cls, path=CORPUS_PATH):
+        with open(path) as f:
+            return cls(f.read())
+
+    def add(self, previous, char):
+        row = self.counts.setdefault(previous, {})
+        row[char] = row.get(char, 0) + 1
+
+    def learn(self, text):
+        text = text.lower()
+        previous = ''
+        for char in text:
+            if char == '\n':
+                previous = ''
+                continue
+            self.add(previous, char)
+            previous = char
+
+    def probabilities(self, previous, labels):
+        row = self.counts.get(previous.lower(), {})
+        total = sum(row.values())
+        chars = [label_char(label) for label in labels]
+        typed = [c for c in chars if c is not None]
+        scores = [(row.get(c, 0) + self.smoothing) / (total + self.smoothing * len(typed)) if c is not None else None for c in chars]
+        neutral = sum(s for s in scores if s is not None) / len(typed) if typed else 1.0
+        p = np.array([neutral if s is None else s for s in scores])
+        return p / p.sum()
+
+class TargetResolver:
+    '''
+    Picks the key the user is aiming at from the gaze point, the measured gaze
+    error and a prior over the next key. The decision is precomputed per page
+    and context into a coarse map of the window, so resolving a frame is one
+    lookup. The prior only decides near the edges of the keys, a gaze point
+    more than max_steal px inside a key always stays on it. Maps are built on
+    a background thread, new ones as well as the ones that change after a
+    selection or a new gaze error estimate. Until a map is ready the old one
+    is used, or the plain hit test if there is none
+    '''
+    def __init__(self, prior, sigma=25.0, prior_weight=0.5, cell=8, reach=2.0, min_sigma=8.0, max_sigma=80.0, rate=0.05,
+                 max_maps=256, max_steal=8.0):
+        self.prior = prior
+        self.prior_weight = prior_weight
+        self.sigma = sigma
+        self.cell = cell
+        self.reach = reach
+        self.min_sigma = min_sigma
+        self.max_sigma = max_sigma
+        self.rate = rate
+        self.max_maps = max_maps
+        self.max_steal = max_steal
+        self.maps = {}
+        self.pages = {}
+        self.map_sigma = sigma
+        self.rebuilds = queue.Queue()
+        # maps queued for their first build
+        self.building = set()
+        self.thread = None
+
+    def decision_map(self, page, previous):
+        '''
+        Returns the map of a page and context, or None while it is being built
+        '''
+        key = (page.name, previous)
+        decisions = self.maps.get(key)
+        if decisions is None and key not in self.building:
+            self.pages[page.name] = page
+            self.building.add(key)
+            self.rebuild([key])
+        return decisions
+
+    def build(self, page, prior, sigma):
+        '''
+        Computes the decision map of a page for the prior of one context
+        '''
+        width, height = Transform.current.sizes[Transform.WINDOW]
+        xs = (np.arange(0, width, self.cell) + self.cell / 2)[None, :, None]
+        ys = (np.arange(0, height, self.cell) + self.cell / 2)[:, None, None]
+        b = page.boxes.astype(np.float64)
+        # how likely the gaze lands on a cell when aiming at a key: the key box
+        # blurred by the gaze error, per axis. Not divided by the area, users
+        # aim at wide keys as precisely as at small ones
+        lx = cdf((xs - b[:, 0]) / sigma) - cdf((xs - b[:, 2]) / sigma)
+        ly = cdf((ys - b[:, 1]) / sigma) - cdf((ys - b[:, 3]) / sigma)
+        log_likelihood = np.log(np.maximum(lx, 1e-12)) + np.log(np.maximum(ly, 1e-12))
+
+        log_posterior = log_likelihood + self.prior_weight * np.log(prior)
+        decisions = np.argmax(log_posterior, axis=2).astype(np.int16)
+
+        # cells well inside a key keep it whatever the prior says
+        depth = np.minimum(np.minimum(xs - b[:, 0], b[:, 2] - xs), np.minimum(ys - b[:, 1], b[:, 3] - ys))
+        deep = depth.max(axis=2) > self.max_steal
+        decisions[deep] = np.argmax(depth, axis=2)[deep]
+
+        # gaze further than reach * sigma from every key stays where it is
+        dx = np.maximum(np.maximum(b[:, 0] - xs, xs - b[:, 2]), 0)
+        dy = np.maximum(np.maximum(b[:, 1] - ys, ys - b[:, 3]), 0)
+        decisions[(dx ** 2 + dy ** 2).min(axis=2) > (self.reach * sigma) ** 2] = -1
+        return decisions
+
+    def rebuild(self, keys):
+        '''
+        Queues the maps for a background rebuild, they stay in use until then.
+        The prior is read here, on the thread that also changes it
+        '''
+        for key in keys:
+            page = self.pages[key[0]]
+            self.rebuilds.put((key, page, self.prior.probabilities(key[1], page.texts), self.map_sigma))
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def keys(self):
+        # the worker adds maps, so the dict is copied in one step before iterating
+        return list(self.maps) + list(self.building)
+
+    def run(self):
+        while True:
+            key, page, prior, sigma = self.rebuilds.get()
+            decisions = self.build(page, prior, sigma)
+            if key in self.building:
+                if len(self.maps) >= self.max_maps:
+                    self.maps.clear()
+                self.maps[key] = decisions
+                self.building.discard(key)
+            # a map dropped in the meantime is rebuilt on its next use instead
+            elif key in self.maps:
+                self.maps[key] = decisions
+
+    def resolve(self, page, x, y, previous=''):
+        '''
+        Returns the index of the key for a gaze point in window space, or -1
+        '''
+        decisions = self.decision_map(page, previous[-1:].lower())
+        if decisions is None:
+            return page.hit_test(x, y)
+        row = min(max(int(y) // self.cell, 0), decisions.shape[0] - 1)
+        col = min(max(int(x) // self.cell, 0), decisions.shape[1] - 1)
+        return int(decisions[row, col])
+
+    def observe(self, x, y, button):
+        '''
+        Updates the gaze error estimate with the gaze point at a completed selection
+        '''
+        cx, cy = button.page.centers[button.index]
+        # per axis variance of the gaze around the key, averaged over time
+        variance = (1 - self.rate) * self.sigma ** 2 + self.rate * ((x - cx) ** 2 + (y - cy) ** 2) / 2
+        self.sigma = math.sqrt(variance)
+        self.sigma = min(max(self.sigma, self.min_sigma), self.max_sigma)
+        # rebuilding the maps is only worth it once the estimate moved noticeably
+        if abs(self.sigma - self.map_sigma) > 0.1 * self.map_sigma:
+            self.map_sigma = self.sigma
+            self.rebuild(self.keys())
+
+    def learn(self, previous, label):
+        '''
+        Adds a typed key to the prior and rebuilds the maps of that context
+        '''
+        char = label_char(label)
+        if char is None:
+            return
+        previous = previous[-1:].lower()
+        self.prior.add(previous, char)
+        self.rebuild([key for key in self.keys() if key[1] == previous])
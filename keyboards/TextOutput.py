@@ -0,0 +1,116 @@
+import queue
+import threading
+from time import perf_counter
+
+# button labels that edit the text, everything else longer than one
+# character switches pages and types nothing
+SPECIAL_KEYS = {'Delete': 'backspace', 'Space': 'space', 'Enter': 'enter'}
+
+class TextOutput:
+    '''
+    The transcribed text of the keyboards. Selections are applied to the local
+    buffer right away so the screen never waits on the OS, the keystrokes are
+    queued and sent by a background thread in batches
+    '''
+    def __init__(self, emit=False, batch_size=32, batch_window=0.01, controller=None):
+        self.text = ''
+        self.emit = emit
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.controller = controller
+        self.queue = queue.Queue()
+        self.thread = None
+
+        self.keys = 0
+        self.batches = 0
+        self.max_delay = 0.0
+        # when the last keystrokes went out
+        self.last_sent = float('-inf')
+
+    def start(self):
+        if self.emit and self.thread is None:
+            if self.controller is None:
+                from pynput.keyboard import Controller
+                self.controller = Controller()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def key(self, text):
+        '''
+        Applies a selected button to the buffer and queues its keystroke,
+        returns false for buttons that do not type anything
+        '''
+        if text in SPECIAL_KEYS:
+            if text == 'Delete':
+                self.text = self.text[:-1]
+            else:
+                self.text += ' ' if text == 'Space' else '\n'
+        elif len(text) == 1:
+            self.text += text
+        else:
+            return False
+
+        if self.thread is not None:
+            self.queue.put((text, perf_counter()))
+        return True
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            # whatever else arrives within the window goes out with it
+            batch = [item]
+            deadline = perf_counter() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - perf_counter()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.send(batch)
+                    return
+                batch.append(item)
+            self.send(batch)
+
+    def send(self, batch):
+        from pynput.keyboard import Key
+        # runs of characters are typed in one call, editing keys in between
+        run = ''
+        for text, _ in batch:
+            if text in SPECIAL_KEYS:
+                if run:
+                    self.controller.type(run)
+                    run = ''
+                key = getattr(Key, SPECIAL_KEYS[text])
+                self.controller.press(key)
+                self.controller.release(key)
+            else:
+                run += text
+        if run:
+            self.controller.type(run)
+
+        self.keys += len(batch)
+        self.batches += 1
+        self.max_delay = max(self.max_delay, perf_counter() - batch[0][1])
+        self.last_sent = perf_counter()
+        for _ in batch:
+            self.queue.task_done()
+
+    def busy(self, settle=0.5):
+        '''
+        Returns true while keystrokes are queued or being sent, and for settle
+        seconds after, until the OS has delivered them. Key presses seen in
+        that time may be our own keystrokes landing in the focused window
+        '''
+        if self.thread is None:
+            return False
+        # unfinished_tasks counts the keystrokes that were queued but not sent yet
+        return self.queue.unfinished_tasks > 0 or perf_counter() - self.last_sent < settle
+
+    def stop(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=1.0)
+            self.thread = None
@@ -1,5 +1,46 @@
 import cv2
-cap = cv2.VideoCapture(0)
+import numpy as np
+import os
+import signal
+import threading
+from time import time, perf_counter, sleep
+launched = perf_counter()
+
+from utils import Transform
+
+# the camera can be captured at a lower resolution for faster inference, the
+# layouts are always drawn on a WINDOW_SIZE canvas and the transform keeps
+# the targeting consistent between the two
+CAPTURE_SIZE = (1280, 720)
+WINDOW_SIZE = (1280, 720)
+SCREEN_SIZE = (1440, 900)
+
+# share of one core the app may use, the governor trades quality for it
+CPU_BUDGET = float(os.environ.get("CPU_BUDGET", 0.5))
+
+# GAZE_SERVICE=1 runs tracking only and streams every sample over a local
+# socket, the keyboard runs in another process (see keyboard_client.py).
+# There is no window, no keyboard and no mouse control then, Ctrl+C stops it
+HEADLESS = bool(os.environ.get("GAZE_SERVICE"))
+
+# the app state is saved to session.json every few seconds and restored on the
+# next start, RESUME=0 starts from scratch
+from tracking import Resume
+RESUME_PATH = "./session.json"
+RESUME_INTERVAL = 5.0
+resume = Resume.load(RESUME_PATH) if os.environ.get("RESUME", "1") != "0" else None
+
+# picks the fastest FOURCC / fps / buffer setting for this webcam, the probe
+# result is cached in camera_config.json so it only runs on the first start
+from tracking import Camera
+cap, camera_config = Camera.open_camera(0, sizes=[CAPTURE_SIZE],
+                                        config=Camera.CameraConfig.from_dict(resume["camera"]) if resume and resume["camera"] else None)
+print("Camera configuration:", camera_config)
+
+transform = Transform.configure(
+    camera_size=(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or CAPTURE_SIZE[0], cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or CAPTURE_SIZE[1]),
+    window_size=WINDOW_SIZE,
+    screen_size=SCREEN_SIZE)
 
 import mediapipe as mp
 mp_drawing = mp.solutions.drawing_utils
@@ -7,21 +48,165 @@ mp_drawing_styles = mp.solutions.drawing_styles
 mp_face_mesh = mp.solutions.face_mesh
 drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
 
-from pynput.mouse import Controller
-mouse = Controller()
+keyboard = None
+if not HEADLESS:
+  from pynput.mouse import Controller
+  mouse = Controller()
+
+  # from keyboards import QWERTYKeyboard
+  # keyboard = QWERTYKeyboard.QWERTYKeyboard()
 
-# from keyboards import QWERTYKeyboard
-# keyboard = QWERTYKeyboard.QWERTYKeyboard()
+  from keyboards import LTNKKeyboard
+  # PROTOCOL picks the study that Enter starts, a name in study/protocols or a path
+  keyboard = LTNKKeyboard.LTNKKeyboard(protocol=os.environ.get("PROTOCOL", "ltnk"))
 
-from keyboards import LTNKKeyboard
-keyboard = LTNKKeyboard.LTNKKeyboard()
+# a session saved on another keyboard or for another user than GAZE_USER asks
+# for is not resumed, the app starts cold instead. Headless sessions have no
+# keyboard state, only the tracking part of them is resumed
+if resume:
+  problem = None
+  if keyboard is not None and resume.get("keyboard") is not None:
+    problem = keyboard.restorable(resume["keyboard"])
+  if os.environ.get("GAZE_USER") and os.environ["GAZE_USER"] != resume.get("user"):
+    problem = "it belongs to user %r, GAZE_USER is %r" % (resume.get("user"), os.environ["GAZE_USER"])
+  if problem is not None:
+    print("Not resuming the saved session, %s" % problem)
+    resume = None
 
 from model import Model as m
-model = m.Model()
+model = m.Model(state=resume["model"] if resume else None)
+
+# per user models, GAZE_USER picks the one to start with and 'u' switches to
+# the next registered user while running
+from model import Registry
+registry = Registry.Registry()
+swapper = Registry.ModelSwapper(registry, model)
+swapper.user = resume["user"] if resume else os.environ.get("GAZE_USER", "default")
+if registry.latest(swapper.user) is not None:
+  swapper.version = resume["model_version"] if resume and resume["model_version"] else registry.latest(swapper.user)
+  model = registry.load(swapper.user, model, swapper.version)
+  print("Model: %s v%d" % (swapper.user, swapper.version))
+
+def snapshot(model):
+  # keeps what the model learned from dwells as a new version of the user.
+  # Until then the dwell updates are only in memory and the resume file
+  if model.updates != loaded_updates:
+    model.save_state()
+    print("Model: saved %s v%d" % (swapper.user, registry.save(swapper.user, model, source="session")))
+
+loaded_updates = model.updates
+if resume:
+  # dwell updates of the previous run that were not saved as a version yet
+  model.set_state(resume["model"])
+
+# dwell speed is tuned per user, keyboard and key class from selections,
+# corrections and abandoned dwells, and kept next to the user's models
+from keyboards import Dwell
+def dwell_path(user):
+  return os.path.join(registry.user_path(user), "dwell_%s.json" % keyboard.layout.name)
+
+def load_dwell(user):
+  if keyboard is not None:
+    keyboard.dwell = Dwell.DwellController(keyboard.dwell_increment)
+    keyboard.dwell.load(dwell_path(user))
+
+def save_dwell(user):
+  if keyboard is not None:
+    os.makedirs(registry.user_path(user), exist_ok=True)
+    keyboard.dwell.save(dwell_path(user))
+
+if keyboard is not None:
+  # every completed dwell means the user was looking at that button, feed it
+  # back into the model so it keeps up with drift over the session
+  def on_select(button):
+    pipeline.model.update(*button.mid_point())
+    if pipeline.prediction is not None:
+      keyboard.resolver.observe(*pipeline.window_point(), button)
+      heatmap.add(keyboard.page.name, "dwell", *pipeline.window_point())
+  keyboard.on_select = on_select
+
+  load_dwell(swapper.user)
+
+  # near misses go to the more likely key, from the measured gaze error and
+  # which character usually follows the last one typed
+  from keyboards import Targeting
+  keyboard.resolver = Targeting.TargetResolver(Targeting.BigramPrior.load())
+
+  # selections are always transcribed on screen, TYPE_OUTPUT=1 also types
+  # them into the focused application
+  from keyboards import TextOutput
+  keyboard.output = TextOutput.TextOutput(emit=bool(os.environ.get("TYPE_OUTPUT"))).start()
+
+  # where the gaze lands on every page, render with python -m keyboards.Heatmap
+  from keyboards import Heatmap
+  heatmap = Heatmap.GazeHeatmap(keyboard.layout, "./data/heatmaps/%s.npz" % keyboard.layout.name)
 
-cv2.namedWindow("Image", cv2.WND_PROP_FULLSCREEN)
-cv2.setWindowProperty("Image", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-cv2.setMouseCallback("Image", keyboard.on_mouse)
+from tracking import Landmarks
+landmarks = Landmarks.LandmarkExtractor()
+
+from tracking import Scheduler
+scheduler = Scheduler.InferenceScheduler()
+
+from tracking import Pipeline
+
+def apply_settings(settings):
+  scheduler.stable_interval = settings['stable_interval']
+
+  # never capture above the configured size
+  width = min(settings['capture_size'][0], CAPTURE_SIZE[0])
+  height = min(settings['capture_size'][1], CAPTURE_SIZE[1])
+  if (width, height) != transform.sizes[Transform.CAMERA]:
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    transform.set_sizes(camera_size=(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or width, cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or height))
+  print("Governor:", governor.stats()['decisions'][-1]['reason'], settings)
+
+from tracking import Governor
+governor = Governor.Governor(CPU_BUDGET, on_change=apply_settings)
+scheduler.stable_interval = governor.settings()['stable_interval']
+# performance overlay, HUD=1 starts with it on and 'h' toggles it
+from keyboards import Hud
+hud = Hud.Hud()
+if os.environ.get("HUD") and keyboard is not None:
+  keyboard.hud = hud
+
+# 'c' starts a calibration run, the samples are appended to the dataset and
+# the model is refit on the new session when it completes
+from model import Dataset
+from tracking import Calibration
+calibration = Calibration.Calibration(Dataset.Dataset())
+
+background = np.full((WINDOW_SIZE[1], WINDOW_SIZE[0], 3), 255, dtype=np.uint8)
+
+service = None
+if HEADLESS:
+  from tracking import Service
+  service = Service.GazeService().start()
+  print("Streaming gaze on", service.address)
+frame = 0
+
+# sampling profiler, PROFILE=1 starts it with the app and 'p' toggles it.
+# Every stop writes a collapsed stack file and a per stage summary to ./profiles
+from utils import Profiler
+profiler = Profiler.SamplingProfiler()
+if os.environ.get("PROFILE"):
+  profiler.start()
+
+def on_mouse(*args):
+  # the callback runs inside cv2.waitKey
+  stage = profiler.stage
+  profiler.stage = "callback"
+  keyboard.on_mouse(*args)
+  profiler.stage = stage
+
+# Ctrl+C ends the loop like Esc, so the shutdown below still runs
+stopping = threading.Event()
+signal.signal(signal.SIGINT, lambda *args: stopping.set())
+
+if not HEADLESS:
+  cv2.namedWindow("Image", cv2.WND_PROP_FULLSCREEN)
+  cv2.setWindowProperty("Image", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+  cv2.setMouseCallback("Image", on_mouse)
 
 with mp_face_mesh.FaceMesh(
     max_num_faces=1,
@@ -29,48 +214,153 @@ with mp_face_mesh.FaceMesh(
     min_detection_confidence=0.5,
     min_tracking_confidence=0.5) as face_mesh:
 
-  while cap.isOpened():
+  pipeline = Pipeline.Pipeline(face_mesh, model, landmarks, scheduler, transform, profiler)
+
+  if resume:
+    if keyboard is not None and resume.get("keyboard") is not None:
+      keyboard.restore(resume["keyboard"])
+    scheduler.set_state(resume["scheduler"])
+    governor.set_level(resume["governor_level"], "resumed")
+    print("Resumed the session saved %.0f s ago" % (time() - resume["saved"]))
+  first_frame = None
+  last_resume_save = time()
+
+  def save_session():
+    Resume.save(RESUME_PATH, {
+      "user": swapper.user,
+      "model_version": swapper.version,
+      "model": pipeline.model.state(),
+      "keyboard": keyboard.snapshot() if keyboard is not None else None,
+      "scheduler": scheduler.state(),
+      "governor_level": governor.level,
+      "camera": camera_config.to_dict() if camera_config is not None else None,
+      "startup": startup,
+    })
+
+  # time to the first frame with a gaze prediction, kept for the last few starts
+  startup = resume["startup"][-9:] if resume else []
+
+  while cap.isOpened() and not stopping.is_set():
+    governor.frame_start()
+    profiler.stage = "capture"
+    previous_user = swapper.user
+    if swapper.poll(pipeline) is not None:
+      save_dwell(previous_user)
+      load_dwell(swapper.user)
+      loaded_updates = pipeline.model.updates
+      print("Model: %s v%d" % (swapper.user, swapper.version), swapper.swaps[-1])
+    start = perf_counter()
     success, image = cap.read()
+    hud.stage('capture', perf_counter() - start)
     if not success:
       print("Ignoring empty camera frame.")
       # If loading a video, use 'break' instead of 'continue'.
       continue
 
-    # To improve performance, optionally mark the image as not writeable to
-    # pass by reference.
-    image.flags.writeable = False
-    image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-    results = face_mesh.process(image)
+    image = pipeline.process(image)
+    hud.stage('facemesh', pipeline.timings['facemesh'])
+    hud.stage('predict', pipeline.timings['predict'])
 
-    height, width, _ = image.shape
-    
-    # Draw the face mesh annotations on the image.
-    image.flags.writeable = True
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    if service is not None:
+      detected = pipeline.prediction is not None
+      service.publish(Service.GazeMessage(time(), frame, detected, pipeline.gaze, pipeline.prediction,
+                                          landmarks.points if detected else None))
+    frame += 1
 
-    image = keyboard.draw(image)
+    if first_frame is None and pipeline.prediction is not None:
+      first_frame = perf_counter() - launched
+      startup.append({"seconds": first_frame, "resumed": resume is not None})
+      print("First usable frame after %.2f s (%s start)" % (first_frame, "warm" if resume else "cold"))
+    if time() - last_resume_save >= RESUME_INTERVAL:
+      save_session()
+      last_resume_save = time()
+
+    if HEADLESS:
+      # no window to wait in, sleep out the rest of the frame budget
+      profiler.stage = "wait"
+      sleep(governor.wait_ms() / 1000)
+      profiler.stage = "other"
+      continue
 
-    if results.multi_face_landmarks:
-      for face_landmarks in results.multi_face_landmarks:
-        relative_left_x = face_landmarks.landmark[473].x * width
-        relative_left_y = face_landmarks.landmark[473].y * height
-        relative_right_x = face_landmarks.landmark[468].x * width
-        relative_right_y = face_landmarks.landmark[468].y * height
+    profiler.stage = "draw"
+    start = perf_counter()
+    if governor.settings()['render'] == 'minimal':
+      # skip converting and scaling the camera image when over budget
+      image = background.copy()
+    else:
+      # Draw the face mesh annotations on the image.
+      image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
-        ave_x = int((relative_left_x + relative_right_x) / 2)
-        ave_y = int((relative_left_y + relative_right_y) / 2)
+      # the layouts are in window space, so draw them on a window sized canvas
+      if (image.shape[1], image.shape[0]) != WINDOW_SIZE:
+        image = cv2.resize(image, WINDOW_SIZE, interpolation=cv2.INTER_NEAREST)
 
-        pred_x, pred_y = model.predict(ave_x, ave_y)
+    if calibration.active:
+      if not calibration.step(pipeline):
+        pipeline.model.fit(*calibration.dataset.training_data(sessions=[calibration.session]))
+        swapper.version = registry.save(swapper.user, pipeline.model, source="calibration", session=calibration.session)
+        loaded_updates = pipeline.model.updates
+        pipeline.scheduler = scheduler
+        print("Calibration: session %d saved, %d outliers rejected" % (calibration.session, calibration.rejected))
+      image = calibration.draw(image)
+    else:
+      image = keyboard.draw(image)
+    hud.stage('draw', perf_counter() - start)
+    hud.frame(pipeline.prediction, keyboard.dwell_resets)
 
-        cv2.circle(image, (int(ave_x), ave_y), 1, (255, 0, 0), 5)
+    if pipeline.prediction is not None and not calibration.active:
+      cv2.circle(image, transform.point(Transform.MODEL, Transform.WINDOW, *pipeline.model_point), 1, (255, 0, 0), 5)
 
-        mouse.position = keyboard.adjust_cursor(int(pred_x // 1.125), int(pred_y // 1.25))
+      point = pipeline.window_point()
+      mouse.position = keyboard.adjust_cursor(*point)
+      heatmap.add(keyboard.page.name, "gaze", *point)
+      if keyboard.page.percentage.any():
+        heatmap.add(keyboard.page.name, "hover", *point)
+    heatmap.maybe_snapshot()
 
     cv2.imshow("Image", image)
 
-    if cv2.waitKey(5) & 0xFF == 27:
+    # waits out the rest of the frame budget instead of spinning
+    profiler.stage = "wait"
+    key = cv2.waitKey(governor.wait_ms()) & 0xFF
+    profiler.stage = "other"
+    if key == 27:
       break
+    elif keyboard.output.busy():
+      # with TYPE_OUTPUT the typed keys reach this window when it has the
+      # focus, they must not trigger the hotkeys. Esc is never typed
+      pass
+    elif key == ord('h'):
+      keyboard.hud = None if keyboard.hud is not None else hud
+    elif key == ord('c') and not calibration.active:
+      # every frame is a sample, so FaceMesh runs on all of them while calibrating
+      pipeline.scheduler = None
+      calibration.start()
+    elif key == ord('p'):
+      for path in profiler.toggle():
+        print("Profile:", path)
+      print("Profiler", "on" if profiler.active else "off")
+    elif key == ord('u'):
+      users = registry.users()
+      if users and not swapper.loading:
+        snapshot(pipeline.model)
+        loaded_updates = pipeline.model.updates
+        next_user = users[(users.index(swapper.user) + 1) % len(users)] if swapper.user in users else users[0]
+        swapper.request(next_user)
 
-  cv2.destroyAllWindows()
+  snapshot(pipeline.model)
+  save_dwell(swapper.user)
+  if keyboard is not None:
+    heatmap.snapshot()
+  for path in profiler.stop():
+    print("Profile:", path)
+  save_session()
+  if not HEADLESS:
+    cv2.destroyAllWindows()
 
-cap.release()
\ No newline at end of file
+cap.release()
+if keyboard is not None:
+  keyboard.output.stop()
+  keyboard.protocol.close()
+if service is not None:
+  service.stop()
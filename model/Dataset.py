@@ -0,0 +1,152 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# one raw little endian file per column, so appending is a plain write and
+# loading is a memory map per column
+COLUMNS = {
+    'session': '<i4',
+    'point': '<i4',
+    'frame': '<i4',
+    'timestamp': '<f8',
+    'target_x': '<f4',      # where the user was looking, in the model output space
+    'target_y': '<f4',
+    'left_x': '<f4',        # iris positions in model space
+    'left_y': '<f4',
+    'right_x': '<f4',
+    'right_y': '<f4',
+    'ave_x': '<f4',
+    'ave_y': '<f4',
+}
+
+# target coordinates of the legacy data/pN_data.csv files, from data_analysis.ipynb
+LEGACY_TARGETS = [
+    (213, 120), (213, 360), (213, 600), (640, 120), (640, 360), (640, 600), (1066, 120), (1066, 360), (1066, 600),
+    (0, 0), (426, 0), (853, 0), (1280, 0), (0, 240), (426, 240), (853, 240), (1280, 240),
+    (0, 480), (426, 480), (852, 480), (1280, 480), (0, 720), (426, 720), (852, 720), (1280, 720),
+]
+
+class Dataset:
+    '''
+    Columnar calibration dataset stored in one folder. The columns are written
+    one after the other, so a run that dies during an append leaves some of
+    them longer, those rows are dropped when the dataset is opened
+    '''
+    def __init__(self, path='./data/calibration'):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            with open(meta_path, 'w') as f:
+                json.dump({'columns': COLUMNS}, f, indent=2)
+        self.repair()
+
+    def column_path(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def column_length(self, name):
+        path = self.column_path(name)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // np.dtype(COLUMNS[name]).itemsize
+
+    def __len__(self):
+        # only rows that made it into every column count
+        return min(self.column_length(name) for name in COLUMNS)
+
+    def repair(self):
+        '''
+        Truncates every column to the rows that are complete, so the next append lines up again
+        '''
+        n = len(self)
+        for name, dtype in COLUMNS.items():
+            path = self.column_path(name)
+            if os.path.exists(path) and os.path.getsize(path) != n * np.dtype(dtype).itemsize:
+                os.truncate(path, n * np.dtype(dtype).itemsize)
+
+    def append(self, rows):
+        '''
+        Appends a dict of equally long columns. Missing columns are filled with zeros
+        '''
+        n = len(next(iter(rows.values())))
+        if n == 0:
+            return
+        for name, dtype in COLUMNS.items():
+            values = np.asarray(rows[name], dtype=dtype) if name in rows else np.zeros(n, dtype=dtype)
+            if len(values) != n:
+                raise ValueError('column %s has %d rows, expected %d' % (name, len(values), n))
+            with open(self.column_path(name), 'ab') as f:
+                f.write(values.tobytes())
+
+    def columns(self):
+        '''
+        Returns every column as a read only memory map
+        '''
+        n = len(self)
+        if n == 0:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {name: np.memmap(self.column_path(name), dtype=dtype, mode='r', shape=(n,)) for name, dtype in COLUMNS.items()}
+
+    def next_session(self):
+        sessions = self.columns()['session']
+        return int(sessions.max()) + 1 if len(sessions) else 0
+
+    def training_data(self, sessions=None, per_point_mean=True):
+        '''
+        Returns the (n, 2) model inputs and targets. With per_point_mean each
+        calibration point of a session is reduced to its mean, like the notebook did
+        '''
+        cols = self.columns()
+        mask = np.ones(len(cols['session']), dtype=bool)
+        if sessions is not None:
+            mask = np.isin(cols['session'], sessions)
+
+        inputs = np.column_stack((cols['ave_x'][mask], cols['ave_y'][mask])).astype(np.float64)
+        targets = np.column_stack((cols['target_x'][mask], cols['target_y'][mask])).astype(np.float64)
+        if not per_point_mean or len(inputs) == 0:
+            return inputs, targets
+
+        # points are numbered per session, so group on both
+        keys = cols['session'][mask].astype(np.int64) * 100000 + cols['point'][mask]
+        _, groups = np.unique(keys, return_inverse=True)
+        counts = np.bincount(groups)
+        mean_inputs = np.column_stack([np.bincount(groups, inputs[:, i]) / counts for i in range(2)])
+        mean_targets = np.column_stack([np.bincount(groups, targets[:, i]) / counts for i in range(2)])
+        return mean_inputs, mean_targets
+
+def import_legacy(dataset, data_dir='./data'):
+    '''
+    Converts the per point csv files and random_points.csv into one dataset session
+    '''
+    session = dataset.next_session()
+    for i, (target_x, target_y) in enumerate(LEGACY_TARGETS):
+        df = pd.read_csv(os.path.join(data_dir, 'p%d_data.csv' % (i + 1)))
+        n = len(df)
+        dataset.append({
+            'session': np.full(n, session),
+            'point': np.full(n, i),
+            'frame': np.arange(n),
+            'target_x': np.full(n, target_x),
+            'target_y': np.full(n, target_y),
+            'left_x': df['left_eye_center_x'], 'left_y': df['left_eye_center_y'],
+            'right_x': df['right_eye_center_x'], 'right_y': df['right_eye_center_y'],
+            'ave_x': df['ave_eye_center_x'], 'ave_y': df['ave_eye_center_y'],
+        })
+
+    # every random point is its own calibration point
+    df = pd.read_csv(os.path.join(data_dir, 'random_points.csv'))
+    n = len(df)
+    dataset.append({
+        'session': np.full(n, session),
+        'point': np.arange(len(LEGACY_TARGETS), len(LEGACY_TARGETS) + n),
+        'frame': np.zeros(n),
+        'target_x': df['x'], 'target_y': df['y'],
+        'ave_x': df['ave_eye_center_x'], 'ave_y': df['ave_eye_center_y'],
+    })
+    return session
+
+if __name__ == '__main__':
+    dataset = Dataset()
+    session = import_legacy(dataset)
+    print('imported the legacy csv files as session %d, %d rows in %s' % (session, len(dataset), dataset.path))
@@ -1,17 +1,149 @@
 import numpy as np
 import joblib
 import math
+import os
 
 class Model:
-    def __init__(self):
-        self.predictor = joblib.load("./model/predictor.pkl")[0]
+    def __init__(self, path="./model/predictor.pkl", state_path="./model/rls_state.npz", forgetting=0.99, delta=0.05,
+                 max_residual=200, center=(640, 360), scale=100, state=None):
+        self.path = path
+        self._predictor = None
+        self.state_path = state_path
+        self.forgetting = forgetting
+        self.delta = delta
+        self.max_residual = max_residual
+        self.center = np.array(center, dtype=np.float64)
+        self.scale = float(scale)
+        self.last_input = None
+        self.updates = 0
+
+        # the pickle (and with it sklearn) is only loaded when neither the given
+        # state nor the saved one can be used
+        if not (state is not None and self.set_state(state)) and not self.load_state():
+            self.theta, self.P = self.initial_state()
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            self._predictor = joblib.load(self.path)[0]
+        return self._predictor
+
+    def initial_state(self):
+        '''
+        Builds the RLS state from the fitted predictor. The inputs are centred and
+        scaled so that delta means the same thing for both coefficients and intercept
+        '''
+        coef = self.predictor.coef_.T * self.scale
+        intercept = self.predictor.intercept_ + self.center @ self.predictor.coef_.T
+        theta = np.vstack((coef, intercept)).astype(np.float64)
+        return theta, np.eye(3) * self.delta
+
+    def features(self, x, y):
+        return np.array([(x - self.center[0]) / self.scale, (y - self.center[1]) / self.scale, 1.0])
 
     def predict(self, x, y):
         '''
         Predicts the x and y coordinates of the mouse cursor
         '''
-        coor = np.array([(x, y)])
-        pred = self.predictor.predict(coor)[0]
+        self.last_input = (x, y)
+        pred = self.features(x, y) @ self.theta
         x_pred = pred[0]
         y_pred = pred[1]
-        return int(x_pred), int(y_pred)
\ No newline at end of file
+        return int(x_pred), int(y_pred)
+
+    def inverse(self, x, y):
+        '''
+        Returns the model input that the model maps to the given screen point
+        '''
+        u = (np.array([x, y], dtype=np.float64) - self.theta[2]) @ np.linalg.inv(self.theta[:2])
+        return u[0] * self.scale + self.center[0], u[1] * self.scale + self.center[1]
+
+    def update(self, target_x, target_y, x=None, y=None):
+        '''
+        Folds a confirmed gaze sample into the regression with one RLS step.
+        The sample defaults to the last input given to predict().
+        Returns true if the sample was used. Runs on every dwell, so nothing is
+        written here, save_state() is left to the caller
+        '''
+        if x is None or y is None:
+            if self.last_input is None:
+                return False
+            x, y = self.last_input
+
+        phi = self.features(x, y)
+        residual = np.array([target_x, target_y], dtype=np.float64) - phi @ self.theta
+
+        # ignore selections that are too far off, the user most likely
+        # picked the wrong key rather than the model drifting
+        if self.max_residual is not None and math.hypot(residual[0], residual[1]) > self.max_residual:
+            return False
+
+        P_phi = self.P @ phi
+        gain = P_phi / (self.forgetting + phi @ P_phi)
+        self.theta += np.outer(gain, residual)
+        self.P = (self.P - np.outer(gain, P_phi)) / self.forgetting
+        self.updates += 1
+        return True
+
+    def fit(self, inputs, targets):
+        '''
+        Refits the regression from scratch on (n, 2) model inputs and screen targets
+        '''
+        phi = np.column_stack(((inputs[:, 0] - self.center[0]) / self.scale, (inputs[:, 1] - self.center[1]) / self.scale, np.ones(len(inputs))))
+        self.theta = np.linalg.lstsq(phi, np.asarray(targets, dtype=np.float64), rcond=None)[0]
+        self.P = np.eye(3) * self.delta
+        self.updates = 0
+        self.save_state()
+
+    def set_forgetting(self, forgetting):
+        '''
+        Sets the forgetting factor, 1 keeps every past sample, lower values adapt faster
+        '''
+        if not 0 < forgetting <= 1:
+            raise ValueError("forgetting factor must be in (0, 1]")
+        self.forgetting = forgetting
+
+    def state(self):
+        '''
+        Returns the arrays that make up the regression
+        '''
+        return {"theta": self.theta, "P": self.P, "updates": self.updates, "center": self.center, "scale": self.scale}
+
+    def set_state(self, state):
+        '''
+        Takes over a saved regression, returns false if it was built with another input normalisation
+        '''
+        if not np.array_equal(state["center"], self.center) or float(state["scale"]) != self.scale:
+            return False
+        self.theta = np.array(state["theta"], dtype=np.float64)
+        self.P = np.array(state["P"], dtype=np.float64)
+        self.updates = int(state["updates"])
+        return True
+
+    def save_state(self):
+        '''
+        Saves the recalibrated regression so the next session starts from it
+        '''
+        if self.state_path is None:
+            return
+        tmp_path = self.state_path + ".tmp.npz"
+        np.savez(tmp_path, **self.state())
+        os.replace(tmp_path, self.state_path)
+
+    def load_state(self):
+        '''
+        Loads the recalibrated regression if one was saved
+        '''
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return False
+        # the state is only valid for the input normalisation it was built with
+        return self.set_state(np.load(self.state_path))
+
+    def reset(self):
+        '''
+        Discards the recalibration and goes back to the fitted predictor
+        '''
+        self.theta, self.P = self.initial_state()
+        self.updates = 0
+        if self.state_path is not None and os.path.exists(self.state_path):
+            os.remove(self.state_path)
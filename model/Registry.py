@@ -0,0 +1,136 @@
+import copy
+import json
+import os
+import re
+import threading
+import numpy as np
+from time import time, perf_counter
+
+class Registry:
+    '''
+    Named, versioned per user models. Every version is the regression state
+    in v<N>.npz plus its metadata in v<N>.json, the json is written last so a
+    version only shows up once it is complete
+    '''
+    def __init__(self, path='./model/registry'):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def user_path(self, user):
+        if not re.fullmatch(r'[\w.-]+', user):
+            raise ValueError('invalid user name %r' % user)
+        return os.path.join(self.path, user)
+
+    def users(self):
+        return sorted(name for name in os.listdir(self.path) if self.versions(name))
+
+    def versions(self, user):
+        path = self.user_path(user)
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(m.group(1)) for m in (re.fullmatch(r'v(\d+)\.json', name) for name in os.listdir(path)) if m)
+
+    def latest(self, user):
+        versions = self.versions(user)
+        return versions[-1] if versions else None
+
+    def metadata(self, user, version=None):
+        version = self.latest(user) if version is None else version
+        with open(os.path.join(self.user_path(user), 'v%d.json' % version)) as f:
+            return json.load(f)
+
+    def save(self, user, model, **metadata):
+        '''
+        Stores the current regression of the model as the next version of the user, returns the version
+        '''
+        path = self.user_path(user)
+        os.makedirs(path, exist_ok=True)
+        version = (self.latest(user) or 0) + 1
+        base = os.path.join(path, 'v%d' % version)
+
+        np.savez(base + '.tmp.npz', **model.state())
+        os.replace(base + '.tmp.npz', base + '.npz')
+
+        metadata = dict(metadata, user=user, version=version, created=time(), updates=model.updates)
+        with open(base + '.tmp.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(base + '.tmp.json', base + '.json')
+        return version
+
+    def load(self, user, base, version=None):
+        '''
+        Returns a copy of the base model with the regression of a stored version.
+        The copy shares the fitted predictor, so no pickle is loaded again
+        '''
+        version = self.latest(user) if version is None else version
+        if version is None:
+            raise KeyError('no models registered for %r' % user)
+        model = copy.copy(base)
+        # registry models are snapshotted as new versions instead of writing the rls state file
+        model.state_path = None
+        model.last_input = None
+        if not model.set_state(np.load(os.path.join(self.user_path(user), 'v%d.npz' % version))):
+            raise ValueError('%s v%d was built with another input normalisation' % (user, version))
+        return model
+
+class ModelSwapper:
+    '''
+    Swaps the active model of a pipeline without stalling the frame loop.
+    Loading happens on a background thread, poll() installs the result
+    between frames, which is a single reference assignment
+    '''
+    def __init__(self, registry, base, max_swap_ms=1.0):
+        self.registry = registry
+        self.base = base
+        self.max_swap_ms = max_swap_ms
+        self.lock = threading.Lock()
+        self.pending = None
+        self.loading = False
+        self.user = None
+        self.version = None
+        self.swaps = []
+
+    def request(self, user, version=None):
+        '''
+        Starts loading a model, returns false if another load is still running
+        '''
+        with self.lock:
+            if self.loading:
+                return False
+            self.loading = True
+        threading.Thread(target=self.load, args=(user, version), daemon=True).start()
+        return True
+
+    def load(self, user, version):
+        start = perf_counter()
+        try:
+            version = self.registry.latest(user) if version is None else version
+            model = self.registry.load(user, self.base, version)
+        except (KeyError, ValueError, OSError) as e:
+            print("Model swap failed:", e)
+            with self.lock:
+                self.loading = False
+            return
+        with self.lock:
+            self.pending = (user, version, model, (perf_counter() - start) * 1000)
+            self.loading = False
+
+    def poll(self, pipeline):
+        '''
+        Installs a loaded model, returns it or None if nothing was pending
+        '''
+        if self.pending is None:
+            return None
+        start = perf_counter()
+        with self.lock:
+            user, version, model, load_ms = self.pending
+            self.pending = None
+        model.last_input = pipeline.model.last_input
+        pipeline.model = model
+        self.user, self.version = user, version
+        swap_ms = (perf_counter() - start) * 1000
+
+        self.swaps.append({'user': user, 'version': version, 'load_ms': load_ms, 'swap_ms': swap_ms})
+        if swap_ms > self.max_swap_ms:
+            print("Model swap took %.2f ms, over the %.2f ms budget" % (swap_ms, self.max_swap_ms))
+        return model
@@ -0,0 +1,186 @@
+import csv
+import itertools
+import json
+import os
+import random
+from time import time, strftime
+
+PROTOCOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'protocols')
+
+class Protocol:
+    '''
+    A typing study loaded from json: a sequence of blocks with a rest in
+    between. A block lists its trials directly ("trials"), draws them from a
+    character set ("chars" with "count") or from a phrase file ("phrases"
+    with "count"), and can be repeated and shuffled
+    '''
+    def __init__(self, spec, base_dir=PROTOCOL_DIR):
+        self.name = spec.get('name', 'study')
+        self.rest = float(spec.get('rest', 0))
+        self.output = spec.get('output', 'results/%s_{time}.csv' % self.name)
+        self.seed = spec.get('seed')
+        self.blocks = spec['blocks']
+        self.base_dir = base_dir
+
+    @classmethod
+    def load(cls, name):
+        '''
+        Loads a protocol by name from the protocols folder, or from a path
+        '''
+        path = name if os.path.exists(name) else os.path.join(PROTOCOL_DIR, name + '.json')
+        with open(path) as f:
+            return cls(json.load(f), os.path.dirname(os.path.abspath(path)))
+
+    def trials(self, index):
+        '''
+        Returns the target strings of one block
+        '''
+        block = self.blocks[index]
+        # seeded per block, so a protocol with a seed gives every participant the same trials
+        rng = random.Random(None if self.seed is None else '%s-%d' % (self.seed, index))
+
+        if 'trials' in block:
+            trials = list(block['trials'])
+        elif 'chars' in block:
+            trials = [rng.choice(block['chars']) for _ in range(block['count'])]
+        else:
+            with open(os.path.join(self.base_dir, block['phrases'])) as f:
+                phrases = [line.strip() for line in f if line.strip()]
+            trials = rng.sample(phrases, min(block.get('count', len(phrases)), len(phrases)))
+
+        trials = trials * block.get('repeat', 1)
+        if block.get('shuffle', False):
+            rng.shuffle(trials)
+        return trials
+
+class ProtocolRunner:
+    '''
+    Runs a protocol on the selections of a keyboard. Every trial is written
+    to the csv as soon as it completes, so nothing accumulates over a long study
+    '''
+    FIELDS = ['block', 'block_name', 'trial', 'target', 'typed', 'correct', 'selections', 'deletes', 'started', 'time']
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.state = 'idle'
+        self.file = None
+        self.writer = None
+        self.path = None
+
+    def start(self, now=None):
+        now = time() if now is None else now
+        self.close()
+        path = self.protocol.output.format(time=strftime('%Y%m%d_%H%M%S'), name=self.protocol.name)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # two studies started in the same second, or by parallel runs, never
+        # share a file, the later one gets a numbered name
+        base, ext = os.path.splitext(path)
+        for attempt in itertools.count():
+            self.path = path if attempt == 0 else '%s_%d%s' % (base, attempt, ext)
+            try:
+                self.file = open(self.path, 'x', newline='')
+                break
+            except FileExistsError:
+                continue
+        self.writer = csv.DictWriter(self.file, fieldnames=self.FIELDS)
+        self.writer.writeheader()
+        self.start_block(0, now)
+
+    def start_block(self, block, now):
+        self.block = block
+        self.block_trials = self.protocol.trials(block)
+        self.trial = -1
+        self.next_trial(now)
+
+    def next_trial(self, now):
+        self.trial += 1
+        if self.trial < len(self.block_trials):
+            self.state = 'trial'
+            self.typed = ''
+            self.selections = 0
+            self.deletes = 0
+            self.started = now
+        elif self.block + 1 < len(self.protocol.blocks):
+            self.state = 'rest'
+            self.rest_until = now + self.protocol.rest
+            self.update(now)
+        else:
+            self.state = 'done'
+            self.close()
+
+    def update(self, now=None):
+        '''
+        Leaves a finished rest, called from select() and prompt()
+        '''
+        now = time() if now is None else now
+        if self.state == 'rest' and now >= self.rest_until:
+            self.start_block(self.block + 1, now)
+
+    def enter(self, now=None):
+        '''
+        Enter starts the study, during a trial it submits what was typed so far
+        '''
+        if self.state in ('idle', 'done'):
+            self.start(now)
+        elif self.state == 'trial':
+            self.finish_trial(time() if now is None else now)
+
+    def select(self, text, now=None):
+        '''
+        Records one selected button, returns false outside of a trial
+        '''
+        now = time() if now is None else now
+        self.update(now)
+        if self.state != 'trial':
+            return False
+
+        self.selections += 1
+        if text == 'Delete':
+            self.typed = self.typed[:-1]
+            self.deletes += 1
+        elif text == 'Space':
+            self.typed += ' '
+        else:
+            self.typed += text
+
+        if len(self.typed) >= len(self.block_trials[self.trial]):
+            self.finish_trial(now)
+        return True
+
+    def finish_trial(self, now):
+        target = self.block_trials[self.trial]
+        self.writer.writerow({
+            'block': self.block,
+            'block_name': self.protocol.blocks[self.block].get('name', ''),
+            'trial': self.trial,
+            'target': target,
+            'typed': self.typed,
+            'correct': sum(a == b for a, b in zip(self.typed, target)),
+            'selections': self.selections,
+            'deletes': self.deletes,
+            'started': self.started,
+            'time': now - self.started,
+        })
+        self.file.flush()
+        self.next_trial(now)
+
+    def prompt(self, now=None):
+        '''
+        Returns what the participant should see
+        '''
+        now = time() if now is None else now
+        self.update(now)
+        if self.state == 'trial':
+            return self.block_trials[self.trial]
+        if self.state == 'rest':
+            return 'Rest %d' % (self.rest_until - now + 1)
+        if self.state == 'done':
+            return 'Test Completed'
+        return ''
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+from time import time
+from utils import Transform
+
+# 5x5 grid over the window, in window space
+DEFAULT_TARGETS = [(x, y) for x in (40, 340, 640, 940, 1240) for y in (40, 200, 360, 520, 680)]
+
+class Calibration:
+    '''
+    Calibration capture mode. Shows one target at a time and collects an iris
+    sample on every frame once the eyes had time to settle. Samples far from
+    the running mean of the point are rejected as they come in, the rest are
+    appended to the dataset once per point
+    '''
+    def __init__(self, dataset, targets=DEFAULT_TARGETS, samples_per_point=120, settle_frames=15,
+                 outlier_sigma=3.0, min_samples=10, transform=None):
+        self.dataset = dataset
+        self.targets = targets
+        self.samples_per_point = samples_per_point
+        self.settle_frames = settle_frames
+        self.outlier_sigma = outlier_sigma
+        self.min_samples = min_samples
+        self.transform = transform if transform is not None else Transform.current
+
+        self.active = False
+        self.session = None
+        self.point = 0
+        self.rejected = 0
+
+    def start(self):
+        self.session = self.dataset.next_session()
+        self.point = 0
+        self.rejected = 0
+        self.active = True
+        self.start_point()
+
+    def start_point(self):
+        self.frames = 0
+        self.rows = {name: [] for name in ('frame', 'timestamp', 'left_x', 'left_y', 'right_x', 'right_y', 'ave_x', 'ave_y')}
+        # running mean and variance (Welford) of the accepted samples
+        self.count = 0
+        self.mean = np.zeros(2)
+        self.m2 = np.zeros(2)
+
+    def is_outlier(self, sample):
+        if self.count < self.min_samples:
+            return False
+        # at least a pixel of spread, so a perfectly still run does not reject everything
+        std = np.maximum(np.sqrt(self.m2 / (self.count - 1)), 1.0)
+        return bool((np.abs(sample - self.mean) > self.outlier_sigma * std).any())
+
+    def add(self, sample):
+        self.count += 1
+        delta = sample - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (sample - self.mean)
+
+    def step(self, pipeline):
+        '''
+        Collects the sample of the current frame, returns false once every point is done
+        '''
+        if not self.active:
+            return False
+
+        self.frames += 1
+        if self.frames > self.settle_frames and pipeline.model_point is not None and pipeline.inferred:
+            sample = np.array(pipeline.model_point, dtype=np.float64)
+            if self.is_outlier(sample):
+                self.rejected += 1
+            else:
+                self.add(sample)
+                left = self.transform.normalized(Transform.MODEL, *pipeline.landmarks.get('left_iris')[:2])
+                right = self.transform.normalized(Transform.MODEL, *pipeline.landmarks.get('right_iris')[:2])
+                for name, value in (('frame', self.frames), ('timestamp', time()), ('left_x', left[0]), ('left_y', left[1]),
+                                    ('right_x', right[0]), ('right_y', right[1]), ('ave_x', sample[0]), ('ave_y', sample[1])):
+                    self.rows[name].append(value)
+
+        if self.count >= self.samples_per_point:
+            self.finish_point()
+            self.point += 1
+            if self.point >= len(self.targets):
+                self.active = False
+                return False
+            self.start_point()
+        return True
+
+    def finish_point(self):
+        n = self.count
+        # targets are stored in screen space, the model output space
+        target_x, target_y = self.transform.window_to_screen(*self.targets[self.point])
+        rows = dict(self.rows)
+        rows['session'] = np.full(n, self.session)
+        rows['point'] = np.full(n, self.point)
+        rows['target_x'] = np.full(n, target_x)
+        rows['target_y'] = np.full(n, target_y)
+        self.dataset.append(rows)
+
+    def draw(self, img):
+        if not self.active:
+            return img
+        x, y = self.targets[self.point]
+        # the target turns green once samples are being collected
+        color = (0, 0, 255) if self.frames <= self.settle_frames else (0, 200, 0)
+        cv2.circle(img, (x, y), 20, color, 2)
+        cv2.circle(img, (x, y), 4, color, cv2.FILLED)
+        progress = int(360 * self.count / self.samples_per_point)
+        cv2.ellipse(img, (x, y), (28, 28), -90, 0, progress, color, 3)
+        cv2.putText(img, 'Calibration %d/%d' % (self.point + 1, len(self.targets)), (25, 700),
+                    cv2.FONT_HERSHEY_COMPLEX_SMALL, 1, (0, 0, 0), 1, cv2.LINE_AA)
+        return img
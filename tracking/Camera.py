@@ -0,0 +1,203 @@
+import cv2
+import json
+import os
+from time import perf_counter
+
+DEFAULT_FOURCCS = ['MJPG', 'YUYV']
+DEFAULT_SIZES = [(1280, 720), (640, 480)]
+DEFAULT_FPS = [60, 30]
+# the smallest buffer the backend honours, 1 returns the newest frame
+DEFAULT_BUFFER_SIZES = [1, 2, 4]
+
+def decode_fourcc(code):
+    code = int(code)
+    return ''.join(chr((code >> 8 * i) & 0xff) for i in range(4))
+
+class CameraConfig:
+    '''
+    A capture configuration and how it performed when it was probed
+    '''
+    def __init__(self, fourcc, size, fps, buffer_size=1, measured_fps=0.0, read_latency=None):
+        self.fourcc = fourcc
+        self.size = tuple(size)
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self.measured_fps = measured_fps
+        self.read_latency = read_latency
+
+    def apply(self, cap):
+        '''
+        Applies the configuration to an open capture, returns true if the camera
+        accepted it. Cameras ignore settings they do not support without an error,
+        so every setting is read back. A backend that cannot report a setting
+        returns 0 or -1, those are taken as accepted
+        '''
+        # settings left empty by a fallback configuration are whatever the camera picks
+        if self.fourcc:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        if self.fps:
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+        # a single frame buffer means read() returns the newest frame instead of a stale one
+        if self.buffer_size:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if (width, height) != self.size:
+            return False
+        fourcc = cap.get(cv2.CAP_PROP_FOURCC)
+        if self.fourcc and fourcc > 0 and decode_fourcc(fourcc) != self.fourcc:
+            return False
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if self.fps and fps > 0 and abs(fps - self.fps) > 1:
+            return False
+        buffer_size = cap.get(cv2.CAP_PROP_BUFFERSIZE)
+        return not self.buffer_size or buffer_size <= 0 or int(buffer_size) == self.buffer_size
+
+    @classmethod
+    def current(cls, cap):
+        '''
+        The configuration the capture is running with, as far as the backend reports it
+        '''
+        fourcc = cap.get(cv2.CAP_PROP_FOURCC)
+        return cls(decode_fourcc(fourcc) if fourcc > 0 else '',
+                   (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))),
+                   int(round(cap.get(cv2.CAP_PROP_FPS))), max(int(cap.get(cv2.CAP_PROP_BUFFERSIZE)), 0))
+
+    def to_dict(self):
+        return {
+            'fourcc': self.fourcc,
+            'size': list(self.size),
+            'fps': self.fps,
+            'buffer_size': self.buffer_size,
+            'measured_fps': self.measured_fps,
+            'read_latency': self.read_latency
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['fourcc'], data['size'], data['fps'], data['buffer_size'], data['measured_fps'], data['read_latency'])
+
+    def __repr__(self):
+        return 'CameraConfig(%s, %dx%d@%d, buffer=%d, measured %.1f fps)' % (
+            self.fourcc, self.size[0], self.size[1], self.fps, self.buffer_size, self.measured_fps)
+
+
+def measure(cap, warmup=5, frames=30):
+    '''
+    Returns the delivered frame rate and the mean time spent blocked in read()
+    '''
+    for _ in range(warmup):
+        cap.read()
+
+    read_time = 0.0
+    count = 0
+    start = perf_counter()
+    for _ in range(frames):
+        t = perf_counter()
+        success, _ = cap.read()
+        read_time += perf_counter() - t
+        if success:
+            count += 1
+    elapsed = perf_counter() - start
+
+    if count == 0:
+        return 0.0, None
+    return count / elapsed, read_time / count
+
+
+def probe(cap, fourccs=DEFAULT_FOURCCS, sizes=DEFAULT_SIZES, fps_list=DEFAULT_FPS, buffer_sizes=DEFAULT_BUFFER_SIZES, frames=30):
+    '''
+    Tries every candidate configuration on the capture and returns them sorted
+    fastest first. Configurations the camera rejects are skipped
+    '''
+    results = []
+    for size in sizes:
+        for fourcc in fourccs:
+            for fps in fps_list:
+                for buffer_size in buffer_sizes:
+                    config = CameraConfig(fourcc, size, fps, buffer_size)
+                    if not config.apply(cap):
+                        continue
+                    config.measured_fps, config.read_latency = measure(cap, frames=frames)
+                    if config.measured_fps > 0:
+                        results.append(config)
+
+    # prefer the highest delivered frame rate, then the smallest buffer, then the shortest blocking read.
+    # frame rates are bucketed to 5 fps so measurement noise does not decide between equal settings.
+    # The loop reads slower than the camera delivers, so every buffered frame is served that much
+    # older. A tight read loop cannot see that, buffered frames even make read() return sooner
+    results.sort(key=lambda c: (-round(c.measured_fps / 5) * 5, c.buffer_size, c.read_latency))
+    return results
+
+
+def fallback(cap, sizes, frames=30):
+    '''
+    For cameras that took none of the candidates: only sets the size and keeps
+    whatever format, rate and buffer the camera picks. Not cached, the next
+    start probes again. Returns None if no size was accepted either
+    '''
+    for size in sizes:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+        config = CameraConfig.current(cap)
+        if config.size == tuple(size):
+            config.measured_fps, config.read_latency = measure(cap, frames=frames)
+            return config
+    return None
+
+
+def load_cache(cache_path):
+    if cache_path is None or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return {}
+
+
+def save_cache(cache_path, cache):
+    if cache_path is None:
+        return
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+def open_camera(device=0, cache_path='./camera_config.json', reprobe=False, config=None, **probe_args):
+    '''
+    Opens the camera with the fastest configuration for this device. The probe
+    only runs the first time, after that the cached configuration is applied.
+    A given config, e.g. from a resumed session, is tried first.
+    Returns the capture and the configuration in use (None if nothing could be applied)
+    '''
+    cap = cv2.VideoCapture(device)
+    if not cap.isOpened():
+        return cap, None
+
+    if config is not None and not reprobe and config.apply(cap):
+        return cap, config
+
+    key = str(device)
+    cache = load_cache(cache_path)
+
+    if not reprobe and key in cache:
+        config = CameraConfig.from_dict(cache[key])
+        # a cached size that is no longer a candidate means the app settings changed
+        sizes = [tuple(size) for size in probe_args.get('sizes', DEFAULT_SIZES)]
+        if config.size in sizes and config.apply(cap):
+            return cap, config
+
+    results = probe(cap, **probe_args)
+    if not results:
+        return cap, fallback(cap, probe_args.get('sizes', DEFAULT_SIZES), probe_args.get('frames', 30))
+
+    config = results[0]
+    config.apply(cap)
+    cache[key] = config.to_dict()
+    save_cache(cache_path, cache)
+    return cap, config
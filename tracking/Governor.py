@@ -0,0 +1,106 @@
+from collections import deque
+from time import perf_counter, process_time
+
+# quality levels from best to cheapest. fps caps the main loop, stable_interval
+# is passed to the inference scheduler, capture_size to the camera and render
+# 'minimal' draws the keyboard on a plain background instead of the camera image
+DEFAULT_LEVELS = [
+    {'fps': 30, 'stable_interval': 2, 'capture_size': (1280, 720), 'render': 'full'},
+    {'fps': 30, 'stable_interval': 3, 'capture_size': (1280, 720), 'render': 'full'},
+    {'fps': 24, 'stable_interval': 3, 'capture_size': (640, 360), 'render': 'full'},
+    {'fps': 20, 'stable_interval': 4, 'capture_size': (640, 360), 'render': 'minimal'},
+    {'fps': 15, 'stable_interval': 4, 'capture_size': (640, 360), 'render': 'minimal'},
+]
+
+class Governor:
+    '''
+    Paces the main loop and keeps the process CPU load near a budget. Every
+    window the CPU time used is compared to the wall time; above the budget
+    the quality level steps down, well below it steps back up. Changes are
+    handed to on_change(settings) and kept for stats()
+    '''
+    def __init__(self, target_load=0.5, levels=DEFAULT_LEVELS, window=1.0, hysteresis=0.15,
+                 down_windows=2, up_windows=5, on_change=None):
+        self.target_load = target_load
+        self.levels = levels
+        self.window = window
+        self.hysteresis = hysteresis
+        self.down_windows = down_windows
+        self.up_windows = up_windows
+        self.on_change = on_change
+
+        self.level = 0
+        self.load = 0.0
+        self.fps = 0.0
+        self.over = 0
+        self.under = 0
+        self.decisions = deque(maxlen=50)
+
+        self.window_wall = perf_counter()
+        self.window_cpu = process_time()
+        self.window_frames = 0
+        self.start = self.window_wall
+
+    def settings(self):
+        return self.levels[self.level]
+
+    def frame_start(self):
+        '''
+        Call at the start of every loop iteration
+        '''
+        now = perf_counter()
+        self.start = now
+        self.window_frames += 1
+
+        elapsed = now - self.window_wall
+        if elapsed >= self.window:
+            cpu = process_time()
+            self.load = (cpu - self.window_cpu) / elapsed
+            self.fps = self.window_frames / elapsed
+            self.window_wall = now
+            self.window_cpu = cpu
+            self.window_frames = 0
+            self.adjust()
+
+    def adjust(self):
+        if self.load > self.target_load * (1 + self.hysteresis):
+            self.over += 1
+            self.under = 0
+        elif self.load < self.target_load * (1 - self.hysteresis):
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = 0
+            self.under = 0
+
+        # step down quickly when over budget, step up slowly so it does not oscillate
+        if self.over >= self.down_windows and self.level + 1 < len(self.levels):
+            self.set_level(self.level + 1, 'load %.2f over budget %.2f' % (self.load, self.target_load))
+        elif self.under >= self.up_windows and self.level > 0:
+            self.set_level(self.level - 1, 'load %.2f under budget %.2f' % (self.load, self.target_load))
+
+    def set_level(self, level, reason='manual'):
+        previous = self.level
+        self.level = level
+        self.over = 0
+        self.under = 0
+        self.decisions.append({'time': perf_counter(), 'from': previous, 'to': level, 'load': self.load, 'reason': reason})
+        if self.on_change is not None:
+            self.on_change(self.settings())
+
+    def wait_ms(self):
+        '''
+        Returns how long cv2.waitKey should wait so the frame takes 1/fps
+        '''
+        remaining = 1.0 / self.settings()['fps'] - (perf_counter() - self.start)
+        return max(1, int(remaining * 1000))
+
+    def stats(self):
+        return {
+            'level': self.level,
+            'settings': dict(self.settings()),
+            'load': self.load,
+            'target_load': self.target_load,
+            'fps': self.fps,
+            'decisions': list(self.decisions),
+        }
@@ -0,0 +1,64 @@
+import numpy as np
+
+# FaceMesh landmark indices (refine_landmarks=True)
+LEFT_IRIS = 473
+RIGHT_IRIS = 468
+
+DEFAULT_LANDMARKS = {
+    'left_iris': LEFT_IRIS,
+    'right_iris': RIGHT_IRIS,
+    # eyelids, for blink detection
+    'left_upper_lid': 386,
+    'left_lower_lid': 374,
+    'right_upper_lid': 159,
+    'right_lower_lid': 145,
+    # eye corners, for the eye region of interest
+    'left_outer_corner': 263,
+    'left_inner_corner': 362,
+    'right_outer_corner': 33,
+    'right_inner_corner': 133,
+}
+
+class LandmarkExtractor:
+    '''
+    Pulls a fixed subset of FaceMesh landmarks into a preallocated (n, 3)
+    array. Downstream stages share self.points instead of going through the
+    protobuf wrappers for every coordinate. Only the needed landmarks are
+    read, which is faster than serializing all 478 of them into numpy, see
+    benchmarks/landmarks.py
+    '''
+    def __init__(self, landmarks=DEFAULT_LANDMARKS):
+        if not isinstance(landmarks, dict):
+            landmarks = {index: index for index in landmarks}
+
+        self.names = list(landmarks.keys())
+        self.indices = np.array([landmarks[name] for name in self.names], dtype=np.intp)
+        self.index_list = self.indices.tolist()
+        self.rows = {name: row for row, name in enumerate(self.names)}
+        self.points = np.zeros((len(self.names), 3), dtype=np.float32)
+        self.valid = False
+
+    def extract(self, face_landmarks):
+        '''
+        Fills self.points from a NormalizedLandmarkList, returns true on success
+        '''
+        landmark = face_landmarks.landmark
+        if len(landmark) <= self.indices.max():
+            self.valid = False
+            return False
+        self.points[:] = [(point.x, point.y, point.z) for point in map(landmark.__getitem__, self.index_list)]
+        self.valid = True
+        return True
+
+    def get(self, name):
+        '''
+        Returns a view of the (x, y, z) row of one landmark
+        '''
+        return self.points[self.rows[name]]
+
+    def mean(self, names):
+        '''
+        Returns the mean normalized (x, y) of the given landmarks
+        '''
+        rows = [self.rows[name] for name in names]
+        return tuple(float(v) for v in self.points[rows, :2].mean(axis=0))
@@ -0,0 +1,82 @@
+import cv2
+from time import perf_counter
+from utils import Transform
+from tracking import Landmarks
+
+class Pipeline:
+    '''
+    The per frame tracking work of the app without any display: FaceMesh,
+    landmark extraction and gaze prediction. Used by main.py and by the
+    offline tools so they all run exactly the same code
+    '''
+    def __init__(self, face_mesh, model, landmarks=None, scheduler=None, transform=None, profiler=None):
+        self.face_mesh = face_mesh
+        self.model = model
+        self.landmarks = landmarks if landmarks is not None else Landmarks.LandmarkExtractor()
+        self.scheduler = scheduler
+        self.transform = transform if transform is not None else Transform.current
+        # optional Profiler.SamplingProfiler, told which stage the frame is in
+        self.profiler = profiler
+
+        # results of the last processed frame
+        self.gaze = None            # normalized iris midpoint
+        self.model_point = None     # iris midpoint in model space
+        self.prediction = None      # predicted gaze in screen space
+        self.inferred = False       # whether FaceMesh ran on the frame
+        self.timings = {'facemesh': 0.0, 'predict': 0.0}
+
+    def process(self, frame):
+        '''
+        Runs one BGR camera frame through tracking and returns the mirrored RGB image
+        '''
+        # the mirror and colour conversion are only there for FaceMesh, count them with it
+        if self.profiler is not None:
+            self.profiler.stage = 'facemesh'
+
+        # To improve performance, optionally mark the image as not writeable to
+        # pass by reference.
+        frame.flags.writeable = False
+        image = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+
+        # FaceMesh only runs on every frame while the eyes are moving, during a
+        # fixation the scheduler skips frames and extrapolates the gaze point
+        start = perf_counter()
+        gaze = None
+        self.inferred = self.scheduler is None or self.scheduler.should_run(image)
+        if self.inferred:
+            image.flags.writeable = False
+            results = self.face_mesh.process(image)
+            if results.multi_face_landmarks:
+                for face_landmarks in results.multi_face_landmarks:
+                    if self.landmarks.extract(face_landmarks):
+                        gaze = self.landmarks.mean(('left_iris', 'right_iris'))
+            if self.scheduler is not None:
+                self.scheduler.observe(gaze, image, self.landmarks if gaze is not None else None)
+        else:
+            gaze = self.scheduler.predict()
+        self.timings['facemesh'] = perf_counter() - start
+
+        if self.profiler is not None:
+            self.profiler.stage = 'predict'
+        start = perf_counter()
+        self.gaze = gaze
+        if gaze is None:
+            self.model_point = None
+            self.prediction = None
+        else:
+            # landmarks are normalized, so the model input does not depend on the capture size
+            ave_x, ave_y = self.transform.normalized(Transform.MODEL, gaze[0], gaze[1])
+            self.model_point = (int(ave_x), int(ave_y))
+            self.prediction = self.model.predict(*self.model_point)
+        self.timings['predict'] = perf_counter() - start
+
+        image.flags.writeable = True
+        return image
+
+    def window_point(self):
+        '''
+        Returns the predicted gaze in window space, or None
+        '''
+        if self.prediction is None:
+            return None
+        return self.transform.point(Transform.SCREEN, Transform.WINDOW, *self.prediction)
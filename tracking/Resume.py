@@ -0,0 +1,38 @@
+import json
+import os
+import numpy as np
+from time import time
+
+VERSION = 1
+
+def to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('%r is not serializable' % type(value))
+
+def save(path, state):
+    '''
+    Writes the resumable state of the app, small enough to do every few seconds
+    '''
+    state = dict(state, version=VERSION, saved=time())
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, default=to_json)
+    os.replace(tmp_path, path)
+
+def load(path, max_age=12 * 3600):
+    '''
+    Returns the saved state, or None if there is none or it is too old to resume from
+    '''
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (ValueError, OSError):
+        return None
+    if state.get('version') != VERSION or time() - state.get('saved', 0) > max_age:
+        return None
+    return state
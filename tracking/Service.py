@@ -0,0 +1,225 @@
+import asyncio
+import os
+import socket
+import struct
+import threading
+import numpy as np
+from time import time, sleep
+
+# a unix socket where available, localhost tcp otherwise
+if hasattr(socket, 'AF_UNIX'):
+    DEFAULT_ADDRESS = '/tmp/typing_without_hands.sock'
+else:
+    DEFAULT_ADDRESS = ('127.0.0.1', 50765)
+
+# timestamp, frame, detected, gaze x, gaze y (normalized), predicted x, y (screen), landmark count
+HEADER = struct.Struct('<dIBffffH')
+LENGTH = struct.Struct('<I')
+
+class GazeMessage:
+    '''
+    One tracking sample as sent over the service
+    '''
+    __slots__ = ('timestamp', 'frame', 'detected', 'gaze', 'prediction', 'landmarks')
+
+    def __init__(self, timestamp, frame, detected, gaze, prediction, landmarks=None):
+        self.timestamp = timestamp
+        self.frame = frame
+        self.detected = detected
+        self.gaze = gaze
+        self.prediction = prediction
+        self.landmarks = landmarks
+
+    def pack(self):
+        gaze = self.gaze if self.gaze is not None else (0.0, 0.0)
+        prediction = self.prediction if self.prediction is not None else (0.0, 0.0)
+        points = b''
+        count = 0
+        if self.landmarks is not None:
+            points = np.ascontiguousarray(self.landmarks, dtype='<f4').tobytes()
+            count = len(self.landmarks)
+        return HEADER.pack(self.timestamp, self.frame, self.detected, gaze[0], gaze[1], prediction[0], prediction[1], count) + points
+
+    @classmethod
+    def unpack(cls, data):
+        timestamp, frame, detected, gx, gy, px, py, count = HEADER.unpack_from(data)
+        landmarks = None
+        if count:
+            landmarks = np.frombuffer(data, dtype='<f4', count=count * 3, offset=HEADER.size).reshape(count, 3)
+        if not detected:
+            return cls(timestamp, frame, False, None, None, landmarks)
+        return cls(timestamp, frame, True, (gx, gy), (px, py), landmarks)
+
+    def age(self):
+        return time() - self.timestamp
+
+
+async def read_message(reader):
+    length, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return GazeMessage.unpack(await reader.readexactly(length))
+
+
+class GazeService:
+    '''
+    Streams gaze messages to any number of local subscribers. The asyncio
+    loop runs on its own thread, so publish() only packs the message and
+    hands it over. Each subscriber has a small queue, when a slow subscriber
+    lets it fill up the oldest samples are dropped instead of blocking tracking
+    '''
+    def __init__(self, address=DEFAULT_ADDRESS, queue_size=2):
+        self.address = address
+        self.queue_size = queue_size
+        self.queues = set()
+        # one handler task per connected subscriber
+        self.tasks = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.published = 0
+        self.dropped = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.serve())
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def serve(self):
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self.server = await asyncio.start_unix_server(self.handle, path=self.address)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.address[0], self.address[1])
+
+    async def handle(self, reader, writer):
+        queue = asyncio.Queue(self.queue_size)
+        self.queues.add(queue)
+        self.tasks.add(asyncio.current_task())
+        try:
+            while True:
+                data = await queue.get()
+                writer.write(LENGTH.pack(len(data)) + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.queues.discard(queue)
+            self.tasks.discard(asyncio.current_task())
+            writer.close()
+
+    def broadcast(self, data):
+        for queue in self.queues:
+            if queue.full():
+                # drop the stalest sample, subscribers only care about the newest gaze
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(data)
+
+    def publish(self, message):
+        '''
+        Sends a GazeMessage to every subscriber, never blocks
+        '''
+        self.published += 1
+        if self.loop is None or not self.queues:
+            return
+        self.loop.call_soon_threadsafe(self.broadcast, message.pack())
+
+    def stop(self):
+        if self.loop is None:
+            return
+
+        async def close():
+            self.server.close()
+            # subscribers that are still connected would keep wait_closed waiting
+            tasks = list(self.tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+class GazeClient:
+    '''
+    Subscribes to a GazeService. Messages are either read with the async
+    messages() generator, or handed to a callback from a background thread
+    '''
+    def __init__(self, address=DEFAULT_ADDRESS, max_age=None):
+        self.address = address
+        self.max_age = max_age
+        self.thread = None
+        self.loop = None
+        self.received = 0
+        self.stale = 0
+
+    async def connect(self, retries=50, delay=0.1):
+        for _ in range(retries):
+            try:
+                if isinstance(self.address, str):
+                    return await asyncio.open_unix_connection(self.address)
+                return await asyncio.open_connection(self.address[0], self.address[1])
+            except (ConnectionError, FileNotFoundError):
+                await asyncio.sleep(delay)
+        raise ConnectionError('could not connect to the gaze service at %s' % (self.address,))
+
+    async def messages(self):
+        reader, writer = await self.connect()
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                self.received += 1
+                # samples that sat in a socket buffer for too long are not worth acting on
+                if self.max_age is not None and message.age() > self.max_age:
+                    self.stale += 1
+                    continue
+                yield message
+        finally:
+            writer.close()
+
+    def run(self, callback):
+        '''
+        Calls callback(message) for every message on a background thread
+        '''
+        async def consume():
+            async for message in self.messages():
+                callback(message)
+
+        def target():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.loop.run_until_complete(consume())
+            except ConnectionError:
+                pass
+            finally:
+                self.loop.close()
+
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+        return self.thread
+
+
+def replay(service, samples, rate=30.0):
+    '''
+    Publishes a scripted list of (gaze, prediction) samples at a fixed rate,
+    a stand-in for the camera when testing clients
+    '''
+    for frame, (gaze, prediction) in enumerate(samples):
+        service.publish(GazeMessage(time(), frame, gaze is not None, gaze, prediction))
+        sleep(1.0 / rate)
@@ -0,0 +1,91 @@
+import cv2
+import importlib
+import os
+import numpy as np
+from time import perf_counter
+
+KEYBOARDS = {
+    'ltnk': ('keyboards.LTNKKeyboard', 'LTNKKeyboard'),
+    'qwerty': ('keyboards.QWERTYKeyboard', 'QWERTYKeyboard'),
+}
+
+RECORD_DTYPE = np.dtype([
+    ('frame', 'i4'), ('time', 'f8'), ('inferred', '?'), ('detected', '?'),
+    ('gaze_x', 'f4'), ('gaze_y', 'f4'), ('pred_x', 'i4'), ('pred_y', 'i4'),
+])
+
+def make_keyboard(layout, results_dir=None):
+    '''
+    Creates the keyboard for a layout name ('ltnk' or 'qwerty'). The study
+    results of its protocol go to results_dir instead of ./results if given
+    '''
+    module, name = KEYBOARDS[layout]
+    keyboard = getattr(importlib.import_module(module), name)()
+    if results_dir is not None:
+        protocol = keyboard.protocol.protocol
+        protocol.output = os.path.join(results_dir, os.path.basename(protocol.output))
+    return keyboard
+
+class Session:
+    '''
+    Runs recorded or synthetic frames through the pipeline and the keyboard
+    without a window. The OS cursor is simulated: the snapped cursor from
+    adjust_cursor is fed back into on_mouse like OpenCV would report it.
+    Frames are processed as fast as possible, the keyboard's dwell runs on
+    the time of the recording instead, frame / fps
+    '''
+    def __init__(self, pipeline, keyboard, fps=30.0):
+        self.pipeline = pipeline
+        self.keyboard = keyboard
+        self.transform = pipeline.transform
+        self.fps = fps
+        self.records = []
+        self.selections = []
+        self.frame = 0
+        keyboard.clock = lambda: self.frame / self.fps
+
+        # keep any existing listener, e.g. the model recalibration
+        previous = keyboard.on_select
+        def on_select(button):
+            self.selections.append((self.frame, perf_counter(), button.text))
+            if previous is not None:
+                previous(button)
+        keyboard.on_select = on_select
+
+    def step(self, image):
+        '''
+        Processes one BGR frame, returns the cursor in window space or None
+        '''
+        start = perf_counter()
+        self.pipeline.process(image)
+
+        cursor = None
+        point = self.pipeline.window_point()
+        if point is not None:
+            screen = self.keyboard.adjust_cursor(*point)
+            cursor = self.transform.screen_to_window(*screen)
+            self.keyboard.on_mouse(cv2.EVENT_MOUSEMOVE, cursor[0], cursor[1], 0, None)
+
+        gaze = self.pipeline.gaze or (np.nan, np.nan)
+        prediction = self.pipeline.prediction or (-1, -1)
+        self.records.append((self.frame, start, self.pipeline.inferred, self.pipeline.gaze is not None,
+                             gaze[0], gaze[1], prediction[0], prediction[1]))
+        self.frame += 1
+        return cursor
+
+    def run(self, cap, max_frames=None):
+        '''
+        Processes frames until the source runs out, returns the number of frames
+        '''
+        while cap.isOpened() and (max_frames is None or self.frame < max_frames):
+            success, image = cap.read()
+            if not success:
+                break
+            self.step(image)
+        return self.frame
+
+    def results(self):
+        '''
+        Returns the per frame records as a numpy structured array
+        '''
+        return np.array(self.records, dtype=RECORD_DTYPE)
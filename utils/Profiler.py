@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+from time import perf_counter, strftime
+
+class SamplingProfiler:
+    '''
+    Samples the stack of one thread from a background thread. The sampled
+    thread only has to set stage when it moves to another part of the frame,
+    every sample is counted under the stage that was set at that moment.
+    Writes a collapsed stack file (flamegraph.pl / speedscope format, with the
+    stage as root frame) and a per stage summary when stopped
+    '''
+    def __init__(self, interval=0.01, output_dir='./profiles', thread=None):
+        self.interval = interval
+        self.output_dir = output_dir
+        self.thread_id = (thread or threading.main_thread()).ident
+        self.stage = 'other'
+
+        self.samples = {}
+        self.labels = {}
+        self.sampler = None
+        self.stopping = threading.Event()
+        self.started = None
+
+    @property
+    def active(self):
+        return self.sampler is not None
+
+    def start(self):
+        if self.active:
+            return self
+        self.samples = {}
+        self.started = perf_counter()
+        self.stopping.clear()
+        self.sampler = threading.Thread(target=self.run, daemon=True)
+        self.sampler.start()
+        return self
+
+    def label(self, code):
+        # building the frame names is the expensive part, so it is done once per code object
+        label = self.labels.get(code)
+        if label is None:
+            label = '%s:%s' % (os.path.basename(code.co_filename), code.co_name)
+            self.labels[code] = label
+        return label
+
+    def run(self):
+        # waiting on the event doubles as the sampling interval
+        while not self.stopping.wait(self.interval):
+            stage = self.stage
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    stack.append(self.label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(stage)
+                key = ';'.join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def stop(self):
+        '''
+        Stops sampling and writes the results, returns the paths written
+        '''
+        if not self.active:
+            return []
+        self.stopping.set()
+        self.sampler.join()
+        self.sampler = None
+        return self.write(perf_counter() - self.started)
+
+    def toggle(self):
+        if self.active:
+            return self.stop()
+        self.start()
+        return []
+
+    def summary(self, elapsed):
+        stages = {}
+        for key, count in self.samples.items():
+            stage = key.split(';', 1)[0]
+            stages[stage] = stages.get(stage, 0) + count
+        total = sum(stages.values())
+        lines = ['%d samples over %.1f s, one every %.1f ms' % (total, elapsed, self.interval * 1000)]
+        for stage, count in sorted(stages.items(), key=lambda item: -item[1]):
+            lines.append('%-10s %6d samples  %5.1f %%  ~%.0f ms' % (stage, count, 100 * count / total, count * elapsed / total * 1000))
+        return lines
+
+    def write(self, elapsed):
+        if not self.samples:
+            return []
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, 'profile_%s' % strftime('%Y%m%d_%H%M%S'))
+        with open(base + '.collapsed', 'w') as f:
+            for key, count in sorted(self.samples.items()):
+                f.write('%s %d\n' % (key, count))
+        with open(base + '_stages.txt', 'w') as f:
+            f.write('\n'.join(self.summary(elapsed)) + '\n')
+        return [base + '.collapsed', base + '_stages.txt']
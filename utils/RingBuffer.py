@@ -0,0 +1,39 @@
+import numpy as np
+
+class RingBuffer:
+    '''
+    Fixed size numpy ring buffer, pushing is O(1) and never allocates
+    '''
+    def __init__(self, size, dtype=np.float64):
+        self.data = np.zeros(size, dtype=dtype)
+        self.size = size
+        self.index = 0
+        self.count = 0
+
+    def push(self, value):
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def values(self):
+        '''
+        Returns the stored values, not in insertion order
+        '''
+        return self.data[:self.count]
+
+    def oldest(self):
+        return self.data[self.index if self.count == self.size else 0]
+
+    def newest(self):
+        return self.data[self.index - 1]
+
+    def mean(self):
+        return float(self.values().mean()) if self.count else 0.0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
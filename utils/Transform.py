@@ -0,0 +1,85 @@
+import numpy as np
+
+# coordinate spaces used by the app
+CAMERA = 'camera'   # pixels of the captured frame
+MODEL = 'model'     # pixels the predictor was calibrated in (its input space)
+WINDOW = 'window'   # pixels of the canvas the keyboard layouts are drawn on
+SCREEN = 'screen'   # OS mouse coordinates, also the predictor's output space
+
+SPACES = (CAMERA, MODEL, WINDOW, SCREEN)
+
+class Transform:
+    '''
+    Converts points between camera, model, window and screen space.
+    All the matrices are built once when the sizes change so a conversion
+    in the main loop is just a multiply and an add
+    '''
+    def __init__(self, camera_size=(1280, 720), model_size=(1280, 720), window_size=(1280, 720), screen_size=(1440, 900)):
+        self.set_sizes(camera_size, model_size, window_size, screen_size)
+
+    def set_sizes(self, camera_size=None, model_size=None, window_size=None, screen_size=None):
+        '''
+        Updates any of the space sizes and rebuilds the matrices
+        '''
+        sizes = dict(getattr(self, 'sizes', {}))
+        for space, size in ((CAMERA, camera_size), (MODEL, model_size), (WINDOW, window_size), (SCREEN, screen_size)):
+            if size is not None:
+                sizes[space] = (int(size[0]), int(size[1]))
+        self.sizes = sizes
+
+        # every space covers the same field of view, so going between two of
+        # them is a scale by the ratio of their sizes
+        self.matrices = {}
+        for src in SPACES:
+            for dst in SPACES:
+                sx = self.sizes[dst][0] / self.sizes[src][0]
+                sy = self.sizes[dst][1] / self.sizes[src][1]
+                self.matrices[(src, dst)] = np.array([[sx, 0, 0], [0, sy, 0], [0, 0, 1]], dtype=np.float64)
+
+        # the hot conversions are also kept as plain floats to skip numpy for single points
+        self.scales = {key: (m[0, 0], m[1, 1], m[0, 2], m[1, 2]) for key, m in self.matrices.items()}
+
+    def matrix(self, src, dst):
+        '''
+        Returns the 3x3 homogeneous matrix from src to dst space
+        '''
+        return self.matrices[(src, dst)]
+
+    def point(self, src, dst, x, y):
+        '''
+        Converts a single point from src to dst space
+        '''
+        sx, sy, tx, ty = self.scales[(src, dst)]
+        return int(x * sx + tx), int(y * sy + ty)
+
+    def points(self, src, dst, pts):
+        '''
+        Converts an (n, 2) array of points from src to dst space
+        '''
+        m = self.matrices[(src, dst)]
+        pts = np.asarray(pts, dtype=np.float64)
+        return pts @ m[:2, :2].T + m[:2, 2]
+
+    def normalized(self, dst, nx, ny):
+        '''
+        Converts a normalized [0, 1] point, like a FaceMesh landmark, to dst space
+        '''
+        w, h = self.sizes[dst]
+        return nx * w, ny * h
+
+    def window_to_screen(self, x, y):
+        return self.point(WINDOW, SCREEN, x, y)
+
+    def screen_to_window(self, x, y):
+        return self.point(SCREEN, WINDOW, x, y)
+
+
+# shared instance that the layouts and the main loop go through
+current = Transform()
+
+def configure(camera_size=None, model_size=None, window_size=None, screen_size=None):
+    '''
+    Reconfigures the shared transform in place and returns it
+    '''
+    current.set_sizes(camera_size, model_size, window_size, screen_size)
+    return current